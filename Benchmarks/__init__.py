@@ -0,0 +1,413 @@
+## Benchmark suite for the pricing, implied vol, Garch, hedging, strategy and data loading hot paths;
+## results are stored as JSON and compared against a baseline run to flag regressions
+
+import os
+import json
+import time
+import platform
+import subprocess
+import statistics
+import tempfile
+import numpy as np
+
+SIZES = (1, 1000, 100000, 1000000)
+
+_BENCHMARKS = {}
+
+
+## Register a benchmark; setup(size) builds the inputs and returns the callable that is timed
+def benchmark(name, sizes=None):
+
+    def register(setup):
+        _BENCHMARKS[name] = (setup, sizes)
+        return setup
+
+    return register
+
+
+## Names of every registered benchmark
+def names():
+
+    return sorted(_BENCHMARKS)
+
+
+## A reproducible synthetic option chain of n contracts as column arrays
+def synthetic_chain(n, seed=0):
+
+    rng = np.random.default_rng(seed)
+    spot = np.full(n, 2000.0)
+    return {
+        'spot': spot,
+        'strike': np.round(spot * np.exp(0.15 * rng.standard_normal(n)) / 5) * 5,
+        'days_to_expiry': rng.integers(7, 366, n).astype(float),
+        'rate': rng.uniform(0.0, 0.05, n),
+        'dividend': rng.uniform(0.0, 0.03, n),
+        'vol': rng.uniform(0.1, 0.5, n),
+        'call_or_put': rng.integers(0, 2, n),
+    }
+
+
+## Time a callable: one warm-up call, then repeat calls, or as many as fit in min_time seconds
+def measure(func, repeat=5, min_time=0.0):
+
+    func()
+    wall, cpu = [], []
+    start = time.perf_counter()
+    while len(wall) < repeat or time.perf_counter() - start < min_time:
+        w0, c0 = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - w0)
+        cpu.append(time.process_time() - c0)
+    return {'repeat': len(wall), 'min': min(wall), 'median': statistics.median(wall),
+            'mean': statistics.fmean(wall), 'stdev': statistics.pstdev(wall), 'cpu_median': statistics.median(cpu)}
+
+
+## Interpreter, library and commit the results were measured on
+def environment():
+
+    import scipy
+    import pandas as pd
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'scipy': scipy.__version__,
+            'pandas': pd.__version__, 'platform': platform.platform(), 'processor': platform.processor(),
+            'cpu_count': os.cpu_count(), 'commit': commit, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+## Run the selected benchmarks (all by default) at the selected sizes; returns the results document. A benchmark
+## whose data is missing is recorded as skipped with the reason instead of stopping the run
+def run(selected=None, sizes=SIZES, repeat=5, min_time=0.0, log=None):
+
+    unknown = [name for name in selected or () if name not in _BENCHMARKS]
+    if unknown:
+        raise ValueError("Unknown benchmarks %s, expected some of %s" % (unknown, ', '.join(names())))
+
+    results = {}
+    for name in (selected or names()):
+        setup, bench_sizes = _BENCHMARKS[name]
+        for size in ([None] if bench_sizes is None else [s for s in bench_sizes if s in sizes]):
+            key = name if size is None else '%s[%d]' % (name, size)
+            try:
+                stats = measure(setup(size), repeat, min_time)
+            except (OSError, LookupError) as exc:
+                results[key] = {'skipped': '%s: %s' % (type(exc).__name__, exc)}
+                if log is not None:
+                    log('%-40s %12s   %s' % (key, 'skipped', results[key]['skipped']))
+                continue
+            if size is not None:
+                stats['size'] = size
+                stats['per_item'] = stats['median'] / size
+            results[key] = stats
+            if log is not None:
+                log('%-40s %12.6f s' % (key, stats['median']))
+    return {'environment': environment(), 'results': results}
+
+
+def save(document, path):
+
+    with open(path, 'w') as out:
+        json.dump(document, out, indent=2)
+
+
+def load(path):
+
+    with open(path) as read:
+        return json.load(read)
+
+
+## Time ratios of a run against a baseline on one statistic; regressions are ratios above 1 + threshold
+def compare(baseline, current, threshold=0.1, statistic='median'):
+
+    rows = []
+    for key in sorted(set(baseline['results']) | set(current['results'])):
+        base = baseline['results'].get(key)
+        new = current['results'].get(key)
+        if (base is not None and 'skipped' in base) or (new is not None and 'skipped' in new):
+            rows.append((key, base and base.get(statistic), new and new.get(statistic), None, 'skipped'))
+            continue
+        if base is None or new is None:
+            rows.append((key, base and base[statistic], new and new[statistic], None, 'missing'))
+            continue
+        ratio = new[statistic] / base[statistic] if base[statistic] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+        elif ratio < 1 / (1 + threshold):
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((key, base[statistic], new[statistic], ratio, status))
+    return rows
+
+
+## Comparison rows as a fixed-width table
+def format_comparison(rows):
+
+    lines = ['%-40s %12s %12s %8s  %s' % ('benchmark', 'baseline s', 'current s', 'ratio', 'status')]
+    for key, base, new, ratio, status in rows:
+        lines.append('%-40s %12s %12s %8s  %s' % (
+            key, '-' if base is None else '%.6f' % base, '-' if new is None else '%.6f' % new,
+            '-' if ratio is None else '%.3f' % ratio, status))
+    return '\n'.join(lines)
+
+
+                                        ########################### Data loading #######################
+
+## A market data store reading straight from the csv files, or through a fresh columnar cache
+def _fresh_store(cached):
+
+    import Utilities as ut
+    from Utilities.market_data import MarketDataStore
+    from Utilities.columnar_cache import ColumnarCache
+
+    cache = None
+    if cached:
+        cache = ColumnarCache(os.path.join(tempfile.gettempdir(), 'option-pricing-benchmarks'))
+    return MarketDataStore(ut.Utilities.getFilePath, cache)
+
+
+@benchmark('load_csv_option_data')
+def _load_csv_option_data(size):
+
+    return lambda: _fresh_store(False).get("iv")
+
+
+@benchmark('load_cached_option_data')
+def _load_cached_option_data(size):
+
+    _fresh_store(True).get("iv")
+    return lambda: _fresh_store(True).get("iv")
+
+
+@benchmark('load_csv_spx')
+def _load_csv_spx(size):
+
+    return lambda: _fresh_store(False).get("SPX")
+
+
+@benchmark('build_option_chain')
+def _build_option_chain(size):
+
+    from Utilities.option_chain import OptionChain
+    frame = _fresh_store(False).get("iv")
+    return lambda: OptionChain.from_frame(frame)
+
+
+                                        ########################### Pricing #######################
+
+## A BSM object filled with the market inputs of the default trade date; without ZeroCurve.csv its rate comes
+## from the generated curve in env.properties
+def _bsm():
+
+    import BlackScholesModel as bs
+    bsm = bs.BSM(30, 2090, 0)
+    bsm.calc_interest_rates()
+    bsm.calc_dividend()
+    bsm.calc_spotprice_SPX()
+    bsm.calc_implied_vol()
+    return bsm
+
+
+@benchmark('bsm_calc_option_value')
+def _bsm_calc_option_value(size):
+
+    return _bsm().calc_option_value
+
+
+@benchmark('bsm_inputs')
+def _bsm_inputs(size):
+
+    return _bsm
+
+
+@benchmark('price_batch', SIZES)
+def _price_batch(size):
+
+    from BlackScholesModel.batch import price_batch
+    c = synthetic_chain(size)
+    return lambda: price_batch(c['spot'], c['strike'], c['days_to_expiry'], c['rate'], c['dividend'], c['vol'],
+                               c['call_or_put'])
+
+
+@benchmark('greeks_batch', SIZES)
+def _greeks_batch(size):
+
+    from BlackScholesModel.greeks import greeks_batch
+    c = synthetic_chain(size)
+    return lambda: greeks_batch(c['spot'], c['strike'], c['days_to_expiry'], c['rate'], c['dividend'], c['vol'],
+                                c['call_or_put'])
+
+
+@benchmark('norm_cdf', SIZES)
+def _norm_cdf(size):
+
+    from BlackScholesModel.special import norm_cdf
+    x = np.random.default_rng(0).standard_normal(size)
+    out = np.empty_like(x)
+    return lambda: norm_cdf(x, out=out)
+
+
+@benchmark('lattice_batch', (1, 1000))
+def _lattice_batch(size):
+
+    from BlackScholesModel.lattice import lattice_batch
+    c = synthetic_chain(size)
+    return lambda: lattice_batch(c['spot'], c['strike'], c['days_to_expiry'], c['rate'], c['dividend'], c['vol'],
+                                 c['call_or_put'], steps=200, method='leisen_reimer', richardson=True)
+
+
+@benchmark('sweep_spot_vol_grid')
+def _sweep_spot_vol_grid(size):
+
+    bsm = _bsm()
+    axes = {'spot': np.linspace(1500, 2500, 201), 'vol': np.linspace(0.05, 0.8, 151)}
+    return lambda: bsm.sweep(axes, ('price', 'delta', 'gamma'))
+
+
+                                        ########################### Implied vol #######################
+
+@benchmark('bsm_imp_vol_solver')
+def _bsm_imp_vol_solver(size):
+
+    return _bsm().imp_vol_solver
+
+
+@benchmark('implied_vol_batch', SIZES)
+def _implied_vol_batch(size):
+
+    from BlackScholesModel.batch import price_batch
+    from BlackScholesModel.implied_vol import implied_vol_batch
+    c = synthetic_chain(size)
+    price = price_batch(c['spot'], c['strike'], c['days_to_expiry'], c['rate'], c['dividend'], c['vol'],
+                        c['call_or_put'])
+    return lambda: implied_vol_batch(price, c['spot'], c['strike'], c['days_to_expiry'], c['rate'],
+                                     c['dividend'], c['call_or_put'])
+
+
+@benchmark('vol_surface_fit')
+def _vol_surface_fit(size):
+
+    import Utilities as ut
+    from Utilities.vol_surface import VolSurface
+    spot = ut.Utilities.market_data().on_date("SPX", ut.Utilities.TRADE_DATE)['Adj Close'].iloc[0]
+    chain = ut.Utilities.option_chain()
+    return lambda: VolSurface.from_chain(chain, ut.Utilities.TRADE_DATE, spot)
+
+
+                                        ########################### Garch #######################
+
+@benchmark('garch_fit')
+def _garch_fit(size):
+
+    import Garch as ga
+    from arch import arch_model
+    returns = ga.Garch().get_spx_data()
+    return lambda: arch_model(returns, p=1, q=1, mean='constant', vol='GARCH',
+                              dist='normal').fit(disp='off', show_warning=False)
+
+
+@benchmark('garch_cached_forecast')
+def _garch_cached_forecast(size):
+
+    import Garch as ga
+    return ga.Garch().calc_ann_option_vol
+
+
+@benchmark('garch_online_update')
+def _garch_online_update(size):
+
+    import Garch as ga
+    online = ga.Garch().online_garch()
+    returns = np.random.default_rng(0).standard_normal(250)
+
+    def update():
+        for r in returns:
+            online.update(r)
+
+    return update
+
+
+                                        ########################### Hedging #######################
+
+@benchmark('bsm_calc_hedged_portfolio')
+def _bsm_calc_hedged_portfolio(size):
+
+    bsm = _bsm()
+    return lambda: bsm.calc_hedged_portfolio("Implied Volatility", 0.001)
+
+
+@benchmark('monte_carlo_hedge', (1000, 100000))
+def _monte_carlo_hedge(size):
+
+    from BlackScholesModel.monte_carlo import MonteCarloHedge
+    mc = MonteCarloHedge(2086.05, 2090, 30, 0.0018, 0.019, 0.118, 0, trans_costs=0.001, path_vol=0.15)
+    return lambda: mc.run(size, seed=0, workers=1)
+
+
+                                        ########################### Strategies #######################
+
+@benchmark('ironcondor')
+def _ironcondor(size):
+
+    import OptionStrategy as OS
+    return OS.OptionStrategyBuilder(2086.05, 13.1999).build_ironcondor
+
+
+@benchmark('strategy_batch_pnl', (1, 1000, 100000))
+def _strategy_batch_pnl(size):
+
+    import OptionStrategy as OS
+    rng = np.random.default_rng(0)
+    centre = rng.uniform(1900, 2200, size)
+    stacked = OS.stack([OS.iron_condor(c - 100, c - 50, c + 50, c + 100, 1, 5, 5, 1) for c in centre])
+    spots = np.linspace(1600, 2600, 101)
+    return lambda: OS.batch_pnl(stacked, spots)
+
+
+@benchmark('optimise_ironcondor')
+def _optimise_ironcondor(size):
+
+    import OptionStrategy as OS
+    builder = OS.OptionStrategyBuilder(2086.05, 13.1999)
+    return lambda: builder.optimise_ironcondor(top_k=10, max_loss=50, seed=0)
+
+
+## Command line entry point; run from the repository root, where env.properties lives
+def main(argv=None):
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m Benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_cmd = commands.add_parser('run', help='run benchmarks and write the results as JSON')
+    run_cmd.add_argument('--output', '-o', default='benchmarks.json')
+    run_cmd.add_argument('--only', nargs='*', choices=names(), metavar='NAME',
+                         help='benchmark names (default: all): %(choices)s')
+    run_cmd.add_argument('--sizes', nargs='*', type=int, default=list(SIZES))
+    run_cmd.add_argument('--repeat', type=int, default=5)
+    run_cmd.add_argument('--min-time', type=float, default=0.0)
+
+    compare_cmd = commands.add_parser('compare', help='compare a run against a baseline')
+    compare_cmd.add_argument('baseline')
+    compare_cmd.add_argument('current')
+    compare_cmd.add_argument('--threshold', type=float, default=0.1,
+                             help='fractional slow-down flagged as a regression (default 0.1)')
+    compare_cmd.add_argument('--statistic', default='median', choices=['min', 'median', 'mean', 'cpu_median'])
+
+    commands.add_parser('list', help='list benchmark names')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        print('\n'.join(names()))
+        return 0
+
+    if args.command == 'run':
+        document = run(args.only, tuple(args.sizes), args.repeat, args.min_time, log=print)
+        save(document, args.output)
+        return 0
+
+    rows = compare(load(args.baseline), load(args.current), args.threshold, args.statistic)
+    print(format_comparison(rows))
+    return 1 if any(row[4] == 'REGRESSION' for row in rows) else 0
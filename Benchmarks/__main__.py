@@ -0,0 +1,4 @@
+import sys
+from Benchmarks import main
+
+sys.exit(main())
@@ -0,0 +1,76 @@
+## Stateless, vectorised Black-Scholes-Merton pricing over arrays of contracts
+
+import numpy as np
+from BlackScholesModel.special import norm_cdf
+
+DAYS_IN_YEAR = 365
+
+
+## Broadcast all contract terms against each other as float arrays
+def broadcast_inputs(*args):
+
+    return np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in args])
+
+
+## Sign used in the BSM formula; +1 for calls (0) and -1 for puts (1), as in 'Put=1 Call=0'
+def option_sign(call_or_put):
+
+    return np.where(np.asarray(call_or_put) == 0, 1.0, -1.0)
+
+
+## Return d1 and d2 for year fractions tau
+def d1_d2(spot, strike, tau, rate, dividend, vol):
+
+    vol_sqrt_t = vol * np.sqrt(tau)
+    d1 = (np.log(spot/strike) + (rate - dividend + 0.5 * vol**2) * tau) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+## Hand back numpy scalars for scalar inputs and arrays otherwise
+def _unwrap(value):
+
+    return value[()] if np.ndim(value) == 0 else value
+
+
+## Price any broadcastable combination of contracts in one pass
+def price_batch(spot, strike, days_to_expiry, rate, dividend, vol, call_or_put):
+
+    spot, strike, dte, rate, dividend, vol = broadcast_inputs(
+        spot, strike, days_to_expiry, rate, dividend, vol)
+    phi = option_sign(call_or_put)
+    tau = dte/DAYS_IN_YEAR
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1, d2 = d1_d2(spot, strike, tau, rate, dividend, vol)
+        disc_q = np.exp(-dividend * tau)
+        disc_r = np.exp(-rate * tau)
+        value = phi*(spot * disc_q * norm_cdf(phi*d1) - strike * disc_r * norm_cdf(phi*d2))
+
+    ## Expired and zero-vol contracts are worth their discounted intrinsic value
+    degenerate = (tau <= 0) | (vol <= 0)
+    if np.any(degenerate):
+        value = np.where(degenerate, np.maximum(phi*(spot*disc_q - strike*disc_r), 0), value)
+
+    return _unwrap(value)
+
+
+## Split an OptionMetrics frame into (strike, days to expiry, option type) arrays
+def chain_terms(df_od):
+
+    if 'Strike' in df_od:
+        strike = df_od['Strike'].to_numpy(dtype=float)
+    else:
+        strike = df_od['Strike x 1000'].to_numpy(dtype=float)/1000
+
+    dte = (df_od['Expiry Date'] - df_od['Trade dAte']).dt.days.to_numpy(dtype=float)
+    call_or_put = df_od['Put=1 Call=0'].to_numpy()
+    return strike, dte, call_or_put
+
+
+## Price every row of an OptionMetrics frame, using its quoted implied vol unless one is given
+def price_chain(df_od, spot, rate, dividend, vol=None):
+
+    strike, dte, call_or_put = chain_terms(df_od)
+    if vol is None:
+        vol = df_od['Implied Vol'].to_numpy(dtype=float)
+    return price_batch(spot, strike, dte, rate, dividend, vol, call_or_put)
@@ -0,0 +1,106 @@
+## Stateless pricing core: pure functions over immutable contract and market snapshots, safe to share across threads
+
+from dataclasses import dataclass, replace, fields
+import numpy as np
+from BlackScholesModel.batch import price_batch
+from BlackScholesModel.greeks import greeks_batch
+from BlackScholesModel.implied_vol import implied_vol_batch
+from BlackScholesModel.hedging import simulate_delta_hedge
+from BlackScholesModel.sweep import sweep as sweep_grid
+from BlackScholesModel.lattice import lattice_batch
+
+
+## Terms of one option; call_or_put follows 'Put=1 Call=0'
+@dataclass(frozen=True, slots=True)
+class Contract:
+
+    strike: float
+    days_to_expiry: float
+    call_or_put: int
+
+    def replace(self, **changes):
+
+        return replace(self, **changes)
+
+
+## Market state an option is priced in; rates and yields are continuously compounded decimals
+@dataclass(frozen=True, slots=True)
+class Market:
+
+    spot: float
+    rate: float
+    dividend: float
+    vol: float
+
+    def replace(self, **changes):
+
+        return replace(self, **changes)
+
+
+## Stack lists of contracts and markets into the column arrays the kernels take
+def _columns(contracts, markets):
+
+    contract_cols = {f.name: np.array([getattr(c, f.name) for c in contracts]) for f in fields(Contract)}
+    market_cols = {f.name: np.array([getattr(m, f.name) for m in markets], dtype=float) for f in fields(Market)}
+    return contract_cols, market_cols
+
+
+## Price of one contract
+def price(contract, market):
+
+    return price_batch(market.spot, contract.strike, contract.days_to_expiry, market.rate,
+                       market.dividend, market.vol, contract.call_or_put)
+
+
+## Price and every Greek of one contract
+def greeks(contract, market):
+
+    return greeks_batch(market.spot, contract.strike, contract.days_to_expiry, market.rate,
+                        market.dividend, market.vol, contract.call_or_put)
+
+
+## Lattice price of one contract, American unless american=False is passed
+def lattice_price(contract, market, **kwargs):
+
+    return lattice_batch(market.spot, contract.strike, contract.days_to_expiry, market.rate, market.dividend,
+                         market.vol, contract.call_or_put, **kwargs)
+
+
+## Implied vol of a price; the vol of the market snapshot is ignored
+def implied_vol(contract, market, option_price, **kwargs):
+
+    return implied_vol_batch(option_price, market.spot, contract.strike, contract.days_to_expiry,
+                             market.rate, market.dividend, contract.call_or_put, **kwargs)
+
+
+## Prices of many (contract, market) pairs in one vectorised call
+def price_many(contracts, markets):
+
+    c, m = _columns(contracts, markets)
+    return price_batch(m['spot'], c['strike'], c['days_to_expiry'], m['rate'], m['dividend'], m['vol'],
+                       c['call_or_put'])
+
+
+## Greeks of many (contract, market) pairs in one vectorised call
+def greeks_many(contracts, markets):
+
+    c, m = _columns(contracts, markets)
+    return greeks_batch(m['spot'], c['strike'], c['days_to_expiry'], m['rate'], m['dividend'], m['vol'],
+                        c['call_or_put'])
+
+
+## Price/Greek cube around a contract and market
+def sweep(contract, market, axes, quantities=('price',)):
+
+    base = {'spot': market.spot, 'strike': contract.strike, 'days_to_expiry': contract.days_to_expiry,
+            'rate': market.rate, 'dividend': market.dividend, 'vol': market.vol,
+            'call_or_put': contract.call_or_put}
+    return sweep_grid(base, axes, quantities)
+
+
+## Delta hedge a sold contract along spot paths, hedging at the market vol
+def delta_hedge(contract, market, spot_path, dte_path, premium, trans_costs=0.0, rebalance_every=None,
+                delta_band=None):
+
+    return simulate_delta_hedge(spot_path, dte_path, contract.strike, market.rate, market.dividend, market.vol,
+                                contract.call_or_put, premium, trans_costs, rebalance_every, delta_band)
@@ -0,0 +1,55 @@
+## Analytic first and second order BSM Greeks from one set of shared intermediates
+
+from collections import namedtuple
+import numpy as np
+from BlackScholesModel.special import norm_cdf, norm_pdf
+from BlackScholesModel.batch import DAYS_IN_YEAR, broadcast_inputs, option_sign, d1_d2, _unwrap
+
+## Vega, vanna and volga are per unit of vol, theta is per year of calendar time and rho per unit of rate
+Greeks = namedtuple('Greeks', ['price', 'delta', 'gamma', 'vega', 'theta', 'rho', 'vanna', 'volga'])
+
+
+## Compute the price and every Greek for any broadcastable combination of contracts
+def greeks_batch(spot, strike, days_to_expiry, rate, dividend, vol, call_or_put):
+
+    spot, strike, dte, rate, dividend, vol = broadcast_inputs(
+        spot, strike, days_to_expiry, rate, dividend, vol)
+    phi = option_sign(call_or_put)
+    tau = dte/DAYS_IN_YEAR
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_t = np.sqrt(tau)
+        d1, d2 = d1_d2(spot, strike, tau, rate, dividend, vol)
+        disc_q = np.exp(-dividend * tau)
+        disc_r = np.exp(-rate * tau)
+
+        pdf_d1 = norm_pdf(d1)
+        cdf_d1 = norm_cdf(phi*d1)
+        cdf_d2 = norm_cdf(phi*d2)
+
+        spot_q = spot * disc_q
+        strike_r = strike * disc_r
+        spot_q_pdf = spot_q * pdf_d1
+
+        price = phi*(spot_q * cdf_d1 - strike_r * cdf_d2)
+        delta = phi * disc_q * cdf_d1
+        gamma = disc_q * pdf_d1 / (spot * vol * sqrt_t)
+        vega = spot_q_pdf * sqrt_t
+        theta = (-spot_q_pdf * vol / (2*sqrt_t)
+                 - phi * rate * strike_r * cdf_d2
+                 + phi * dividend * spot_q * cdf_d1)
+        rho = phi * strike_r * tau * cdf_d2
+        vanna = -disc_q * pdf_d1 * d2 / vol
+        volga = vega * d1 * d2 / vol
+
+    greeks = [price, delta, gamma, vega, theta, rho, vanna, volga]
+
+    ## Expired and zero-vol contracts collapse onto their discounted intrinsic value
+    degenerate = (tau <= 0) | (vol <= 0)
+    if np.any(degenerate):
+        itm = phi*(spot_q - strike_r) > 0
+        greeks[0] = np.where(degenerate, np.maximum(phi*(spot_q - strike_r), 0), price)
+        greeks[1] = np.where(degenerate, np.where(itm, phi*disc_q, 0.0), delta)
+        greeks[2:] = [np.where(degenerate, 0.0, g) for g in greeks[2:]]
+
+    return Greeks(*[_unwrap(g) for g in greeks])
@@ -0,0 +1,91 @@
+## Vectorised delta-hedge simulator for a short option, over one or many spot paths at once
+
+from collections import namedtuple
+import numpy as np
+from BlackScholesModel.batch import DAYS_IN_YEAR, option_sign, _unwrap
+from BlackScholesModel.greeks import greeks_batch
+
+## Struct of arrays; every per-step field has the shape of the spot paths (..., steps)
+HedgeResult = namedtuple('HedgeResult', ['dte', 'spot', 'delta', 'hedge', 'stock_holdings', 'shares_bought',
+                                         'txn_cost', 'dividend_income', 'bank', 'cumulative_pnl', 'payoff', 'total_pnl',
+                                         'total_txn_cost', 'rebalances'])
+
+
+## Hedge ratio actually held: model delta on rebalance days, the previous holding otherwise. Rebalance every
+## rebalance_every steps (daily by default), or with a delta_band whenever delta drifts outside it, plus every
+## rebalance_every steps if that is also given; the last step always trades
+def hedge_positions(delta, rebalance_every=None, delta_band=None):
+
+    steps = delta.shape[-1]
+    if delta_band is None:
+        every = rebalance_every or 1
+        scheduled = np.arange(steps) // every * every
+        scheduled[-1] = steps - 1
+        return np.take(delta, scheduled, axis=-1), np.broadcast_to(
+            np.isin(np.arange(steps), scheduled), delta.shape)
+
+    ## Band rebalancing is path dependent, so walk the (short) time axis and vectorise over paths
+    hedge = np.empty_like(delta)
+    rebalanced = np.zeros(delta.shape, dtype=bool)
+    hedge[..., 0] = delta[..., 0]
+    rebalanced[..., 0] = True
+    for t in range(1, steps):
+        due = (np.abs(delta[..., t] - hedge[..., t-1]) > delta_band) | (t == steps - 1)
+        if rebalance_every:
+            due |= t % rebalance_every == 0
+        hedge[..., t] = np.where(due, delta[..., t], hedge[..., t-1])
+        rebalanced[..., t] = due
+    return hedge, rebalanced
+
+
+## Bank account b[t] = b[t-1]*growth[t] - outflow[t], solved with cumulative products and sums
+def accrue_bank(opening, growth, outflow):
+
+    compounded = np.cumprod(growth, axis=-1)
+    discounted_outflow = np.cumsum(outflow[..., 1:] / compounded[..., 1:], axis=-1)
+    bank = np.empty(np.broadcast_shapes(compounded.shape, outflow.shape))
+    bank[..., 0] = opening
+    bank[..., 1:] = compounded[..., 1:] * (opening[..., None] - discounted_outflow)
+    return bank
+
+
+## Sell the option for the premium and delta hedge it along each spot path until expiry;
+## per-path terms must broadcast against spot, e.g. strikes of shape (n, 1) for n paths
+def simulate_delta_hedge(spot, days_to_expiry, strike, rate, dividend, vol, call_or_put,
+                         premium, trans_costs=0.0, rebalance_every=None, delta_band=None):
+
+    spot = np.asarray(spot, dtype=float)
+    dte = np.broadcast_to(np.asarray(days_to_expiry, dtype=float), spot.shape)
+    premium = np.broadcast_to(np.asarray(premium, dtype=float), spot.shape[:-1])
+
+    delta = np.asarray(greeks_batch(spot, strike, dte, rate, dividend, vol, call_or_put).delta, dtype=float)
+    hedge, rebalanced = hedge_positions(delta, rebalance_every, delta_band)
+
+    stock_holdings = hedge * spot
+    change = np.diff(hedge, axis=-1, prepend=0.0)
+    shares_bought = change * spot
+    ## The final trade unwinds the position
+    shares_bought[..., -1] += stock_holdings[..., -1]
+
+    txn_cost = np.abs(shares_bought) * trans_costs
+    txn_cost[..., 0] += premium * trans_costs
+
+    ## Cash accrues at the rate over the calendar days between rebalances, and the shares held over those days
+    ## pay their dividend yield into it
+    years = np.diff(-dte, axis=-1, prepend=-dte[..., :1]) / DAYS_IN_YEAR
+    growth = np.exp(np.asarray(rate) * years)
+    dividend_income = np.zeros(np.broadcast_shapes(spot.shape, np.shape(dividend)))
+    dividend_income[..., 1:] = stock_holdings[..., :-1] * np.expm1(np.asarray(dividend) * years)[..., 1:]
+    opening = premium - (shares_bought[..., 0] + txn_cost[..., 0])
+    bank = accrue_bank(opening, growth, shares_bought + txn_cost - dividend_income)
+
+    ## Per-path strikes and option types, e.g. of shape (n, 1), reduced to the terminal spots' shape
+    strike_at_expiry = np.broadcast_to(np.asarray(strike, dtype=float), spot.shape)[..., -1]
+    sign_at_expiry = np.broadcast_to(option_sign(call_or_put), spot.shape)[..., -1]
+    payoff = np.maximum(sign_at_expiry * (spot[..., -1] - strike_at_expiry), 0)
+    cumulative_pnl = bank + stock_holdings
+    cumulative_pnl[..., -1] += stock_holdings[..., -1] - payoff
+
+    return HedgeResult(dte, spot, delta, hedge, stock_holdings, shares_bought, txn_cost, dividend_income, bank,
+                       cumulative_pnl, _unwrap(payoff), _unwrap(cumulative_pnl[..., -1]),
+                       _unwrap(txn_cost.sum(axis=-1)), _unwrap(rebalanced.sum(axis=-1)))
@@ -0,0 +1,103 @@
+## Vectorised implied volatility solver for whole option chains
+
+from collections import namedtuple
+import numpy as np
+from BlackScholesModel.batch import DAYS_IN_YEAR, broadcast_inputs, option_sign, chain_terms, price_batch, _unwrap
+from BlackScholesModel.greeks import greeks_batch
+
+ImpliedVol = namedtuple('ImpliedVol', ['iv', 'converged', 'iterations'])
+
+VOL_LOWER = 1e-4
+VOL_UPPER = 5.0
+
+
+## Corrado-Miller seed, which reduces to Brenner-Subrahmanyam at the money
+def seed_vol(price, spot_q, strike_r, tau, phi):
+
+    call = np.where(phi > 0, price, price + spot_q - strike_r)
+    half_moneyness = (spot_q - strike_r)/2
+    excess = call - half_moneyness
+    root = np.sqrt(np.maximum(excess**2 - (spot_q - strike_r)**2/np.pi, 0))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        seed = np.sqrt(2*np.pi/tau) / (spot_q + strike_r) * (excess + root)
+
+    return np.where(np.isfinite(seed) & (seed > 0), seed, 0.2)
+
+
+## Solve for the vols that reproduce the given prices, contract by contract, in one vectorised loop; unsolvable
+## prices get NaN, or with clamp the bound whose price is nearest, as a bounded minimiser of the pricing error would
+def implied_vol_batch(price, spot, strike, days_to_expiry, rate, dividend, call_or_put,
+                      tol=1e-10, max_iter=50, lower=VOL_LOWER, upper=VOL_UPPER, clamp=False):
+
+    price, spot, strike, dte, rate, dividend = broadcast_inputs(
+        price, spot, strike, days_to_expiry, rate, dividend)
+    phi = np.broadcast_to(option_sign(call_or_put), price.shape)
+    shape = price.shape
+    price, spot, strike, dte, rate, dividend, phi = [
+        np.ravel(a) for a in (price, spot, strike, dte, rate, dividend, phi)]
+
+    tau = dte/DAYS_IN_YEAR
+    spot_q = spot * np.exp(-dividend * tau)
+    strike_r = strike * np.exp(-rate * tau)
+
+    ## Prices outside the no-arbitrage bounds have no implied vol
+    floor = np.maximum(phi*(spot_q - strike_r), 0)
+    cap = np.where(phi > 0, spot_q, strike_r)
+    solvable = (tau > 0) & (price > floor) & (price < cap)
+
+    iv = np.full(price.shape, np.nan)
+    converged = np.zeros(price.shape, dtype=bool)
+    iterations = np.zeros(price.shape, dtype=int)
+
+    lo = np.full(price.shape, float(lower))
+    hi = np.full(price.shape, float(upper))
+    sigma = np.clip(seed_vol(price, spot_q, strike_r, tau, phi), lower, upper)
+    active = np.flatnonzero(solvable)
+
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+
+        g = greeks_batch(spot[active], strike[active], dte[active], rate[active],
+                         dividend[active], sigma[active], np.where(phi[active] > 0, 0, 1))
+        diff = g.price - price[active]
+        iterations[active] += 1
+
+        ## Price is increasing in vol, so the sign of the error tightens the bracket
+        hi[active] = np.where(diff > 0, sigma[active], hi[active])
+        lo[active] = np.where(diff <= 0, sigma[active], lo[active])
+
+        done = (np.abs(diff) < tol * np.maximum(price[active], 1)) | (hi[active] - lo[active] < tol)
+        iv[active[done]] = sigma[active[done]]
+        converged[active[done]] = True
+
+        ## Halley step from vega and volga, bisecting whenever it leaves the bracket
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = diff / g.vega
+            step = newton / (1 - 0.5 * newton * g.volga / g.vega)
+        proposal = sigma[active] - step
+        inside = np.isfinite(proposal) & (proposal > lo[active]) & (proposal < hi[active])
+        sigma[active] = np.where(inside, proposal, 0.5*(lo[active] + hi[active]))
+
+        active = active[~done]
+
+    if clamp:
+        missing = np.flatnonzero(~converged & np.isfinite(price))
+        if len(missing):
+            terms = [a[missing] for a in (spot, strike, dte, rate, dividend)]
+            call_or_put_missing = np.where(phi[missing] > 0, 0, 1)
+            error_lower = np.abs(price[missing] - price_batch(*terms, lower, call_or_put_missing))
+            error_upper = np.abs(price[missing] - price_batch(*terms, upper, call_or_put_missing))
+            nearest = np.where(error_lower <= error_upper, float(lower), float(upper))
+            iv[missing] = np.where(solvable[missing], sigma[missing], nearest)
+
+    return ImpliedVol(*[_unwrap(np.reshape(a, shape)) for a in (iv, converged, iterations)])
+
+
+## Implied vols of every row of an OptionMetrics frame from its mid bid-ask
+def implied_vol_chain(df_od, spot, rate, dividend, **kwargs):
+
+    strike, dte, call_or_put = chain_terms(df_od)
+    mid = 0.5*(df_od['Bid Price'].to_numpy(dtype=float) + df_od['Ask Price'].to_numpy(dtype=float))
+    return implied_vol_batch(mid, spot, strike, dte, rate, dividend, call_or_put, **kwargs)
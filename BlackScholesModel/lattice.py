@@ -0,0 +1,239 @@
+## Binomial (Cox-Ross-Rubinstein, Leisen-Reimer) and trinomial lattices for American and European options, with
+## backward induction sliced over every node of a step and a whole block of contracts at once
+
+import numpy as np
+from BlackScholesModel.batch import (DAYS_IN_YEAR, broadcast_inputs, option_sign, d1_d2, chain_terms, price_batch,
+                                     _unwrap)
+
+METHODS = ('crr', 'leisen_reimer', 'trinomial')
+
+
+## Convergence order in the step count the Richardson extrapolation removes: Leisen-Reimer converges at second
+## order for European exercise, everything else (smoothed, for crr and trinomial) at first order
+def richardson_order(method, american):
+
+    return 2 if method == 'leisen_reimer' and not american else 1
+
+
+## Peizer-Pratt method 2 inversion of the normal cdf onto a binomial probability with n (odd) steps
+def _peizer_pratt(z, n):
+
+    root = np.sqrt(0.25 - 0.25*np.exp(-(z/(n + 1/3 + 0.1/(n + 1)))**2 * (n + 1/6)))
+    return 0.5 + np.copysign(root, z)
+
+
+## Step count a method runs with; Leisen-Reimer needs an odd number of steps
+def lattice_steps(steps, method):
+
+    steps = max(int(steps), 1)
+    if method == 'leisen_reimer' and steps % 2 == 0:
+        steps += 1
+    return steps
+
+
+## Refuse to roll back a lattice whose branch probabilities fall outside [0, 1] for any contract
+def _check_probabilities(*probabilities):
+
+    bad = np.zeros(np.shape(probabilities[0]), dtype=bool)
+    for p in probabilities:
+        bad |= ~((p >= 0) & (p <= 1))
+    if bad.any():
+        raise ValueError("Lattice branch probabilities outside [0, 1] for contracts %s"
+                         % np.flatnonzero(bad.ravel()).tolist())
+
+
+## Replace the last step by Black-Scholes prices over one dt at the given spots, floored by exercise if American;
+## this smooths the odd-even oscillation of crr and trinomial lattices (Broadie-Detemple)
+def _smoothed(nodes, strike, dt, rate, dividend, vol, phi, american, out):
+
+    out[...] = price_batch(nodes, strike, dt*DAYS_IN_YEAR, rate, dividend, vol, np.where(phi > 0, 0, 1))
+    if american:
+        np.maximum(out, phi*(nodes - strike), out=out)
+
+
+## Buffers shared by every block of contracts priced with the same lattice size
+def _buffers(rows, steps, method):
+
+    width = 2*steps + 1 if method == 'trinomial' else steps + 1
+    return np.empty((rows, width)), np.empty((rows, width)), np.empty((rows, width)), np.empty((rows, width))
+
+
+## Roll a binomial lattice back to the root; inputs are (rows, 1) columns and buffers are (rows, steps + 1)
+def _binomial(spot, strike, tau, rate, dividend, vol, phi, steps, method, american, smooth, buffers):
+
+    values, nodes, scratch, _ = buffers
+    dt = tau/steps
+    growth = np.exp((rate - dividend)*dt)
+
+    if method == 'crr':
+        ## CRR spacing centred on the log-spot drift, so p stays near 1/2 however large r - q is against vol
+        log_up = vol*np.sqrt(dt)
+        centre = (rate - dividend - 0.5*vol**2)*dt
+        up, down = np.exp(centre + log_up), np.exp(centre - log_up)
+        p = (growth - down)/(up - down)
+    else:
+        d1, d2 = d1_d2(spot, strike, tau, rate, dividend, vol)
+        p = _peizer_pratt(d2, steps)
+        up = growth*_peizer_pratt(d1, steps)/p
+        down = (growth - p*up)/(1 - p)
+    _check_probabilities(p, np.where(down > 0, 0.0, -1.0))
+
+    disc = np.exp(-rate*dt)
+    p_up, p_down = disc*p, disc*(1 - p)
+
+    ## Terminal spots S u^j d^(n-j), then payoffs
+    j = np.arange(steps + 1)
+    np.multiply(j, np.log(up), out=nodes)
+    nodes += (steps - j)*np.log(down)
+    np.exp(nodes, out=nodes)
+    nodes *= spot
+    inv_down = 1/down
+    last = steps - 1
+    if smooth:
+        nodes[:, :steps] *= inv_down
+        _smoothed(nodes[:, :steps], strike, dt, rate, dividend, vol, phi, american, values[:, :steps])
+        last -= 1
+    else:
+        np.subtract(nodes, strike, out=values)
+        values *= phi
+        np.maximum(values, 0, out=values)
+
+    for i in range(last, -1, -1):
+        v, t = values[:, :i + 1], scratch[:, :i + 1]
+        np.multiply(values[:, 1:i + 2], p_up, out=t)
+        v *= p_down
+        v += t
+
+        ## Early exercise; the spots one step back are the lower i + 1 nodes divided by d
+        if american:
+            s = nodes[:, :i + 1]
+            s *= inv_down
+            np.subtract(s, strike, out=t)
+            t *= phi
+            np.maximum(v, t, out=v)
+
+    return values[:, 0].copy()
+
+
+## Roll a trinomial lattice (Boyle, log-spot spacing vol sqrt(3 dt)) back to the root; buffers are (rows, 2 steps + 1).
+## The spacing widens to sqrt(vol^2 dt + drift^2) where the drift is too large for the middle branch to stay positive
+def _trinomial(spot, strike, tau, rate, dividend, vol, phi, steps, american, smooth, buffers):
+
+    values, nodes, mid, top = buffers
+    dt = tau/steps
+    drift = (rate - dividend - 0.5*vol**2)*dt
+    dx = np.maximum(vol*np.sqrt(3*dt), np.sqrt(vol**2*dt + drift**2))
+    a = np.minimum((vol**2*dt + drift**2)/dx**2, 1)
+    b = drift/dx
+    _check_probabilities(0.5*(a + b), 1 - a, 0.5*(a - b))
+
+    disc = np.exp(-rate*dt)
+    p_up, p_mid, p_down = disc*0.5*(a + b), disc*(1 - a), disc*0.5*(a - b)
+
+    ## Every step's spots are a centred slice of the terminal grid S e^(k dx), k = -n..n
+    np.multiply(np.arange(-steps, steps + 1), dx, out=nodes)
+    np.exp(nodes, out=nodes)
+    nodes *= spot
+    last = steps - 1
+    if smooth:
+        n = 2*steps - 1
+        _smoothed(nodes[:, 1:n + 1], strike, dt, rate, dividend, vol, phi, american, values[:, :n])
+        last -= 1
+    else:
+        np.subtract(nodes, strike, out=values)
+        values *= phi
+        np.maximum(values, 0, out=values)
+
+    for i in range(last, -1, -1):
+        n = 2*i + 1
+        v, t_mid, t_up = values[:, :n], mid[:, :n], top[:, :n]
+        np.multiply(values[:, 1:n + 1], p_mid, out=t_mid)
+        np.multiply(values[:, 2:n + 2], p_up, out=t_up)
+        v *= p_down
+        v += t_mid
+        v += t_up
+
+        if american:
+            np.subtract(nodes[:, steps - i:steps + i + 1], strike, out=t_mid)
+            t_mid *= phi
+            np.maximum(v, t_mid, out=v)
+
+    return values[:, 0].copy()
+
+
+## Price flat arrays of contracts with one lattice size, block by block through the same buffers
+def _price_blocks(spot, strike, tau, rate, dividend, vol, phi, steps, method, american, smooth, block):
+
+    value = np.empty(len(spot))
+    buffers = _buffers(min(block, len(spot)), steps, method)
+
+    for start in range(0, len(spot), block):
+        rows = slice(start, start + block)
+        count = len(spot[rows])
+        columns = [a[rows, None] for a in (spot, strike, tau, rate, dividend, vol, phi)]
+        views = [buf[:count] for buf in buffers]
+        if method == 'trinomial':
+            value[rows] = _trinomial(*columns, steps, american, smooth, views)
+        else:
+            value[rows] = _binomial(*columns, steps, method, american, smooth, views)
+
+    return value
+
+
+## Price any broadcastable combination of American (or European) contracts on a lattice; with richardson, the
+## prices at steps and about steps/2 are extrapolated to remove the leading error term. smooth (default: with
+## richardson) prices the last crr or trinomial step in closed form, which the extrapolation needs to work
+def lattice_batch(spot, strike, days_to_expiry, rate, dividend, vol, call_or_put, steps=200, method='crr',
+                  american=True, richardson=False, smooth=None, block=256):
+
+    if method not in METHODS:
+        raise ValueError("Unknown lattice method %r, expected one of %s" % (method, ', '.join(METHODS)))
+
+    spot, strike, dte, rate, dividend, vol, phi = np.broadcast_arrays(
+        *broadcast_inputs(spot, strike, days_to_expiry, rate, dividend, vol), option_sign(call_or_put))
+    shape = spot.shape
+    spot, strike, dte, rate, dividend, vol, phi = [
+        np.ravel(a) for a in (spot, strike, dte, rate, dividend, vol, phi)]
+    tau = dte/DAYS_IN_YEAR
+
+    ## Expired and zero-vol contracts are worth their discounted intrinsic value, or exercising now if more
+    value = price_batch(spot, strike, dte, rate, dividend, vol, np.where(phi > 0, 0, 1))
+    value = np.atleast_1d(np.asarray(value, dtype=float)).copy()
+    if american:
+        np.maximum(value, phi*(spot - strike), out=value)
+
+    if smooth is None:
+        smooth = richardson
+    smooth = smooth and method != 'leisen_reimer'
+
+    live = np.flatnonzero((tau > 0) & (vol > 0))
+    if len(live):
+        terms = [a[live] for a in (spot, strike, tau, rate, dividend, vol, phi)]
+        fine_steps = lattice_steps(max(steps, 2), method)
+        fine = _price_blocks(*terms, fine_steps, method, american, smooth, block)
+
+        if richardson:
+            coarse_steps = lattice_steps(fine_steps//2, method)
+            coarse = _price_blocks(*terms, coarse_steps, method, american, smooth, block)
+            ratio = (fine_steps/coarse_steps)**richardson_order(method, american)
+            fine = fine + (fine - coarse)/(ratio - 1)
+
+        value[live] = fine
+
+    return _unwrap(value.reshape(shape))
+
+
+## Price every row of an OptionMetrics frame on a lattice, using its quoted implied vol unless one is given
+def lattice_chain(df_od, spot, rate, dividend, vol=None, **kwargs):
+
+    strike, dte, call_or_put = chain_terms(df_od)
+    if vol is None:
+        vol = df_od['Implied Vol'].to_numpy(dtype=float)
+    return lattice_batch(spot, strike, dte, rate, dividend, vol, call_or_put, **kwargs)
+
+
+## Early exercise premium: the American lattice price less the closed-form European price
+def early_exercise_premium(spot, strike, days_to_expiry, rate, dividend, vol, call_or_put, **kwargs):
+
+    american = lattice_batch(spot, strike, days_to_expiry, rate, dividend, vol, call_or_put, american=True, **kwargs)
+    return american - price_batch(spot, strike, days_to_expiry, rate, dividend, vol, call_or_put)
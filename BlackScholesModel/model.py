@@ -0,0 +1,283 @@
+## The BSM facade over the project data; loads pandas, the market data and Garch, so it is imported on first use
+import pandas as pd
+import numpy as np
+import Utilities as ut
+import datetime as dt
+import Garch as ga
+from BlackScholesModel.monte_carlo import MonteCarloHedge
+from BlackScholesModel.core import Contract, Market
+from BlackScholesModel import core
+from Utilities.instrumentation import instrument
+
+## A facade over the stateless pricing core; every calculation works on immutable snapshots of its fields
+@instrument
+class BSM:
+
+    def __init__(self, days_to_expiry, strike_price, call_or_put, trade_date=None):
+
+        ## Per instance, so concurrent sessions each keep their own solver switch and last price
+        self.check_iv = False
+        self.bsm_option_price = 0
+        self.american_option_price = 0
+        self.days_to_expiry = days_to_expiry
+        self.strike_price = strike_price
+        self.call_or_put = call_or_put
+        self.trade_date = ut.Utilities.trade_date(trade_date)
+        self.spot_price = 0
+        self.interest_rates = 0
+        self.dividend = 0
+        self.iv = 0
+        self.brent_iv = 0.01
+        self.mid_bid_ask = 0
+        self.option_premium = 0
+        self.option_payoff = 0
+        self.sum_transaction_costs = 0
+        self.total_pnl = 0
+
+    ## Determine which option formula to use
+    def __option_type(self):
+
+        if self.call_or_put == 0:
+            return 1
+        else:
+            return -1
+
+    ## The volatility in use: the solved one when the Brent solver is on, the quoted one otherwise
+    def __get_vol(self):
+
+        if self.check_iv:
+            return self.brent_iv
+        return self.iv
+
+    ## Immutable snapshot of the option terms
+    def contract(self):
+
+        return Contract(self.strike_price, self.days_to_expiry, self.call_or_put)
+
+    ## Immutable snapshot of the market inputs, at the volatility in use
+    def market(self):
+
+        return Market(self.spot_price, self.interest_rates, self.dividend, self.__get_vol())
+
+    ## Compute the price and every Greek of the option in one pass
+    def __get_greeks(self):
+
+        return core.greeks(self.contract(), self.market())
+
+    ## Find the max open interest option metric quote for the given date, strike and option type
+    def __get_quote(self):
+
+        return ut.Utilities.option_chain().quote(self.trade_date, self.strike_price, self.call_or_put)
+
+    ## Calculate interval of spotprices around given option
+    def __calc_spotprice_interval(self):
+
+        x = np.arange(-0.3, 0.31, 0.01)
+        return self.sweep({'spot': (1+x)*self.spot_price})['price']
+
+    ## Calculate second-order polynomial approximation of option price wrt spot price of underlying
+    def __calc_ts_approx(self):
+
+        greeks = self.__get_greeks()
+        x = np.arange(-0.3, 0.31, 0.01)
+
+        ts1_approx_price = greeks.price + greeks.delta * (self.spot_price*x)
+        ts2_approx_price = greeks.price + greeks.delta * (self.spot_price*x) + greeks.gamma * (self.spot_price*x)**2/2
+        return ts1_approx_price, ts2_approx_price
+
+    ## Get SPX data from the trade date to Expiry
+    def __get_SPX_data_to_expiry(self):
+
+        df = ut.Utilities.market_data().get("SPX")
+        df_SPX = df.loc[self.trade_date:self.trade_date+dt.timedelta(days=self.days_to_expiry)]
+        return df_SPX.reset_index()
+
+    ## Calculating ineterest rates from the zero curve
+    def calc_interest_rates(self):
+
+        curve = ut.Utilities.yield_curve(self.trade_date)
+        self.interest_rates = curve.rate(self.days_to_expiry)
+
+    ## Calculating the dividend yield
+    def calc_dividend(self):
+
+        df_Div = ut.Utilities.market_data().as_of("dividend", self.trade_date)
+        self.dividend = df_Div['Rate'].iloc[0]/100
+
+    ## Calculating spot price of SPX on the trade date
+    def calc_spotprice_SPX(self):
+
+        df_SPX = ut.Utilities.market_data().on_date("SPX", self.trade_date)
+        self.spot_price = df_SPX['Adj Close'].iloc[0]
+
+    ## Calculating implied volatility of a specific strike; strikes not quoted on the trade date, or any strike
+    ## when use_surface is set, read it from the fitted volatility surface at the option's days to expiry
+    def calc_implied_vol(self, use_surface=False):
+
+        quote = self.__get_quote()
+        if quote is not None and not use_surface:
+            self.mid_bid_ask = quote.mid
+            self.iv = quote.iv
+            return
+
+        surface = ut.Utilities.vol_surface(self.trade_date)
+        self.iv = float(surface.vol(self.strike_price, self.days_to_expiry))
+        if quote is not None:
+            self.mid_bid_ask = quote.mid
+        else:
+            ## Without a quote the option trades at its surface price
+            self.mid_bid_ask = float(core.price(self.contract(), self.market().replace(vol=self.iv)))
+
+    ## Calculating options value
+    def calc_option_value(self):
+
+        option_price = core.price(self.contract(), self.market())
+
+        if not self.check_iv:
+            self.bsm_option_price = option_price
+
+        return option_price
+
+    ## Calculating the American option value on a lattice, from the same rate, dividend and vol inputs as the BSM price
+    def calc_american_value(self, method='leisen_reimer', steps=200, richardson=True):
+
+        self.american_option_price = core.lattice_price(self.contract(), self.market(), steps=steps, method=method,
+                                                        richardson=richardson)
+        return self.american_option_price
+
+    ##  A function to find the IV implied by the mean bid-ask price using the bracketed Halley solver; prices with
+    ##  no solution in [0.01, 3] take the nearest bound
+    def imp_vol_solver(self):
+
+        solved = core.implied_vol(self.contract(), self.market(), self.mid_bid_ask, lower=0.01, upper=3, clamp=True)
+        self.brent_iv = solved.iv
+
+    ## Price/Greek cube over any combination of spot, strike, days_to_expiry, rate, dividend and vol axes
+    def sweep(self, axes, quantities=('price',)):
+
+        return core.sweep(self.contract(), self.market(), axes, quantities)
+
+    ## A function to plot the chart based on change in days to expiry
+    def plot_dte(self, dte_type):
+
+        dte_dic = {"Week": 7, "Month": 31, "Quarter": 124,
+                   "Six Months": 185, "Year": 365, "5 years": 1825}
+        dte_arr = np.array(list(dte_dic.values()), dtype=float)
+        rates = ut.Utilities.yield_curve(self.trade_date).rate(dte_arr)
+        dte_op_lst = core.price(self.contract().replace(days_to_expiry=dte_arr), self.market().replace(rate=rates))
+        dic_dte = {}
+
+        if dte_type == "Continuous":
+            dic_dte["Days to Expiry"] = dte_dic.values()
+        else:
+            dic_dte["Days to Expiry"] = dte_dic.keys()
+
+        dic_dte["Black Scholes Option Price"] = dte_op_lst
+        pd_dte = pd.DataFrame(dic_dte)
+        ut.Utilities.plot_chart(pd_dte)
+
+    ## A function to plot the charts based on change in interest rates
+    def plot_interest_rates(self):
+
+        r_list = np.arange(0, 0.14, 0.0025)
+        r_op_list = self.sweep({'rate': r_list})['price']
+
+        pd_r = pd.DataFrame(
+            {"Interest rate": r_list,
+             "Black Scholes Option Price": r_op_list}
+        )
+        ut.Utilities.plot_chart(pd_r)
+
+    ## A function to plot the charts based on change in spot price
+    def plot_spot_price(self):
+
+        spot_lst = np.arange(self.spot_price*0.4,
+                             self.spot_price*1.6, self.spot_price*0.05)
+        var = self.__option_type()
+        intrinsic_val_lst = np.maximum(var*(spot_lst - self.strike_price), 0)
+        spot_opt_lst = self.sweep({'spot': spot_lst})['price']
+        pd_spot = pd.DataFrame(
+            {"Black Scholes Option Price": spot_opt_lst,
+             "Spot Price": spot_lst,
+             "Intrinsic Value of Option": intrinsic_val_lst}
+        )
+        ut.Utilities.plot_chart(pd_spot)
+
+    ## A function to plot the charts based on changes in Implied Volatility
+    def plot_q2i(self):
+
+        sigma_list = np.arange(0.05, 0.85, 0.05)
+        sigma_op_list = self.sweep({'vol': sigma_list})['price']
+
+        pd_sigma = pd.DataFrame(
+            {"Implied Volatility (%)": sigma_list * 100,
+             "Black Scholes Option Price": sigma_op_list}
+        )
+        ut.Utilities.plot_chart(pd_sigma)
+
+    ## A function to plot the charts based on change in spot price
+    def plot_ts_approximation(self):
+
+        spot_lst = (1+np.arange(-0.3, 0.31, 0.01))*self.spot_price
+
+        ts_lst = self.__calc_ts_approx()
+        bs_lst = self.__calc_spotprice_interval()
+
+        pd_ts = pd.DataFrame(
+            {"Spot Price": spot_lst,
+             "Black Scholes Option Price": bs_lst,
+             "1st-Order Taylor-Series Approximation": ts_lst[0],
+             "2nd-Order Taylor-Series Approximation": ts_lst[1]}
+        )
+        ut.Utilities.plot_chart(pd_ts)
+
+    def __calc_ask_price(self):
+
+        quote = self.__get_quote()
+        if quote is None:
+            return self.mid_bid_ask
+        return quote.ask
+
+    ## Simulate delta hedging the sold option along the realised SPX path up to expiry
+    def calc_hedged_portfolio(self, vol_type, trans_costs, rebalance_every=None, delta_band=None):
+
+        market = self.market()
+        if vol_type == "Forecast Volatility":
+            market = market.replace(vol=ga.Garch(self.trade_date).calc_ann_option_vol()/100)
+
+        df_SPX = self.__get_SPX_data_to_expiry()
+        spot = df_SPX['Adj Close'].to_numpy()
+        dte = ((self.trade_date + dt.timedelta(days=self.days_to_expiry) - df_SPX['Date'])
+               / dt.timedelta(days=1)).to_numpy()
+
+        self.option_premium = self.__calc_ask_price()
+        hedge = core.delta_hedge(self.contract(), market, spot, dte, self.option_premium, trans_costs,
+                                 rebalance_every, delta_band)
+
+        df_delta = pd.DataFrame({'DTE': hedge.dte.astype(int),
+                                 'Delta': hedge.delta,
+                                 'Spot Price ($)': hedge.spot,
+                                 'Stock Holdings ($)': hedge.stock_holdings,
+                                 'Shares Bought ($)': hedge.shares_bought,
+                                 'Trans. Cost ($)': hedge.txn_cost,
+                                 'Cum. P&L ($)': hedge.cumulative_pnl})
+
+        self.option_payoff = hedge.payoff
+        self.sum_transaction_costs = hedge.total_txn_cost
+        self.total_pnl = hedge.total_pnl
+
+        return df_delta
+
+    ## Distribution of the delta-hedged P&L over simulated GBM (at the option vol) or fitted GARCH(1,1) paths
+    def calc_hedge_distribution(self, dynamics, trans_costs, n_paths=10000, workers=None, seed=None):
+
+        contract, market = self.contract(), self.market()
+        garch_params = None
+        if dynamics == "GARCH":
+            online = ga.Garch(self.trade_date).online_garch()
+            garch_params = (online.mu, online.omega, online.alpha, online.beta, online.variance)
+
+        mc = MonteCarloHedge(market.spot, contract.strike, contract.days_to_expiry, market.rate, market.dividend,
+                             market.vol, contract.call_or_put, self.__calc_ask_price(), trans_costs,
+                             dynamics, garch_params=garch_params)
+        return mc.run(n_paths, seed=seed, workers=workers)
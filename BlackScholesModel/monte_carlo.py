@@ -0,0 +1,115 @@
+## Monte Carlo delta-hedging P&L distributions over batched GBM or GARCH(1,1) spot paths
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from BlackScholesModel.batch import DAYS_IN_YEAR, price_batch
+from BlackScholesModel.hedging import simulate_delta_hedge
+
+HedgeDistribution = namedtuple('HedgeDistribution', ['pnl', 'txn_cost', 'mean', 'std', 'pnl_quantiles',
+                                                     'hedge_error_quantiles', 'txn_cost_mean', 'txn_cost_quantiles'])
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+## GBM paths of shape (n_paths, steps + 1) over a horizon of calendar days
+def gbm_paths(spot, vol, drift, days, steps, n_paths, rng):
+
+    dt = days / steps / DAYS_IN_YEAR
+    shocks = rng.standard_normal((n_paths, steps))
+    log_steps = (drift - 0.5 * vol**2) * dt + vol * np.sqrt(dt) * shocks
+    paths = np.empty((n_paths, steps + 1))
+    paths[:, 0] = 0.0
+    np.cumsum(log_steps, axis=1, out=paths[:, 1:])
+    return spot * np.exp(paths)
+
+
+## GARCH(1,1) paths with daily log returns in %, as fitted by Garch; variance is the next day's
+def garch_paths(spot, mu, omega, alpha, beta, variance, steps, n_paths, rng):
+
+    shocks = rng.standard_normal((n_paths, steps))
+    log_returns = np.empty((n_paths, steps))
+    sigma2 = np.full(n_paths, float(variance))
+
+    ## The recursion runs along the (short) time axis, vectorised across paths
+    for t in range(steps):
+        resid = np.sqrt(sigma2) * shocks[:, t]
+        log_returns[:, t] = mu + resid
+        sigma2 = omega + alpha * resid**2 + beta * sigma2
+
+    paths = np.empty((n_paths, steps + 1))
+    paths[:, 0] = 0.0
+    np.cumsum(log_returns / 100, axis=1, out=paths[:, 1:])
+    return spot * np.exp(paths)
+
+
+## Simulate and hedge one chunk of paths; top level so it can run in a worker process
+def _simulate_chunk(config, seed, n_paths):
+
+    rng = np.random.default_rng(seed)
+    steps, days = config['steps'], config['days_to_expiry']
+
+    if config['dynamics'] == 'GARCH':
+        mu, omega, alpha, beta, variance = config['garch_params']
+        paths = garch_paths(config['spot'], mu, omega, alpha, beta, variance, steps, n_paths, rng)
+    else:
+        paths = gbm_paths(config['spot'], config['path_vol'], config['drift'], days, steps, n_paths, rng)
+
+    dte = np.linspace(days, 0, steps + 1)
+    hedge = simulate_delta_hedge(paths, dte, config['strike'], config['rate'], config['dividend'],
+                                 config['hedge_vol'], config['call_or_put'], config['premium'],
+                                 config['trans_costs'], config['rebalance_every'], config['delta_band'])
+    return hedge.total_pnl, hedge.total_txn_cost
+
+
+class MonteCarloHedge:
+
+    def __init__(self, spot, strike, days_to_expiry, rate, dividend, hedge_vol, call_or_put,
+                 premium=None, trans_costs=0.0, dynamics='GBM', path_vol=None, drift=None,
+                 garch_params=None, steps=None, rebalance_every=None, delta_band=None):
+
+        if dynamics == 'GARCH' and garch_params is None:
+            raise ValueError("GARCH dynamics need (mu, omega, alpha, beta, variance)")
+        if premium is None:
+            premium = price_batch(spot, strike, days_to_expiry, rate, dividend, hedge_vol, call_or_put)
+
+        ## GARCH steps are trading days; GBM defaults to the same daily grid
+        if steps is None:
+            steps = max(int(round(days_to_expiry * 252 / 365)), 1)
+
+        self.config = {
+            'spot': float(spot), 'strike': float(strike), 'days_to_expiry': float(days_to_expiry),
+            'rate': float(rate), 'dividend': float(dividend), 'hedge_vol': float(hedge_vol),
+            'call_or_put': call_or_put, 'premium': float(premium), 'trans_costs': trans_costs,
+            'dynamics': dynamics, 'path_vol': float(hedge_vol if path_vol is None else path_vol),
+            'drift': float(rate - dividend if drift is None else drift), 'garch_params': garch_params,
+            'steps': steps, 'rebalance_every': rebalance_every, 'delta_band': delta_band,
+        }
+
+    ## Simulate n_paths in bounded-memory chunks, optionally fanned out across worker processes
+    def run(self, n_paths, chunk_size=20000, seed=None, workers=None):
+
+        if n_paths < 1:
+            raise ValueError("n_paths must be at least 1, got %r" % (n_paths,))
+        sizes = [min(chunk_size, n_paths - i) for i in range(0, n_paths, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        if workers is None or workers <= 1:
+            results = [_simulate_chunk(self.config, s, n) for s, n in zip(seeds, sizes)]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(_simulate_chunk, [self.config]*len(sizes), seeds, sizes))
+
+        pnl = np.concatenate([r[0] for r in results])
+        txn_cost = np.concatenate([r[1] for r in results])
+        return MonteCarloHedge.summarise(pnl, txn_cost)
+
+    ## Distribution statistics of the hedged P&L; the hedging error is the P&L about its mean
+    @staticmethod
+    def summarise(pnl, txn_cost):
+
+        mean = pnl.mean()
+        return HedgeDistribution(pnl, txn_cost, mean, pnl.std(),
+                                 dict(zip(QUANTILES, np.quantile(pnl, QUANTILES))),
+                                 dict(zip(QUANTILES, np.quantile(pnl - mean, QUANTILES))),
+                                 txn_cost.mean(), dict(zip(QUANTILES, np.quantile(txn_cost, QUANTILES))))
@@ -0,0 +1,222 @@
+## Normal distribution kernels: erfc-based cdf and pdf as ufunc-style functions with out= buffers, float32 support and
+## a scalar fast path, in pure NumPy so the pricing core imports without scipy; scipy.special is an optional backend
+
+import os
+import sys
+import math
+import numpy as np
+
+## W. J. Cody's rational approximations of erf/erfc (Math. Comp. 1969), as in the SPECFUN routine CALERF
+_A = (3.16112374387056560e00, 1.13864154151050156e02, 3.77485237685302021e02, 3.20937758913846947e03,
+      1.85777706184603153e-1)
+_B = (2.36012909523441209e01, 2.44024637934444173e02, 1.28261652607737228e03, 2.84423683343917062e03)
+_C = (5.64188496988670089e-1, 8.88314979438837594e00, 6.61191906371416295e01, 2.98635138197400131e02,
+      8.81952221241769090e02, 1.71204761263407058e03, 2.05107837782607147e03, 1.23033935479799725e03,
+      2.15311535474403846e-8)
+_D = (1.57449261107098347e01, 1.17693950891312499e02, 5.37181101862009858e02, 1.62138957456669019e03,
+      3.29079923573345963e03, 4.36261909014324716e03, 3.43936767414372164e03, 1.23033935480374942e03)
+_P = (3.05326634961232344e-1, 3.60344899949804439e-1, 1.25781726111229246e-1, 1.60837851487422766e-2,
+      6.58749161529837803e-4, 1.63153871373020978e-2)
+_Q = (2.56852019228982242e00, 1.87295284992346725e00, 5.27905102951428412e-1, 6.05183413124413191e-2,
+      2.33520497626869185e-3)
+
+_SQRT_PI_INV = 5.6418958354775628695e-1
+_SQRT_HALF = 0.70710678118654752440
+_INV_SQRT_2PI = 0.39894228040143267794
+_THRESHOLD = 0.46875
+_XBIG = 26.543
+
+## Arrays up to this size go through math.erfc element by element, which beats the branchy vector path
+_SMALL = 1024
+
+## 'auto' uses scipy.special once something else has imported it and pure NumPy otherwise
+BACKENDS = ('auto', 'numpy', 'scipy')
+
+
+class _State:
+
+    backend = os.environ.get('OPTION_PRICING_SPECIAL', 'auto')
+
+
+## Select the kernels behind erfc and norm_cdf for arrays; scalars always use math.erfc
+def set_backend(name):
+
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend %r, expected one of %s" % (name, ', '.join(BACKENDS)))
+    if name == 'scipy':
+        import scipy.special
+    _State.backend = name
+
+
+def get_backend():
+
+    return _State.backend
+
+
+def _use_scipy():
+
+    if _State.backend == 'auto':
+        return 'scipy.special' in sys.modules
+    return _State.backend == 'scipy'
+
+
+## Cast the input to the working dtype and allocate the output: out's dtype if given, else float32 inputs stay
+## float32 and everything else is computed in float64
+def _prepare(x, out, dtype):
+
+    if out is not None:
+        return np.broadcast_to(np.asarray(x, dtype=out.dtype), out.shape), out
+    if dtype is None:
+        dtype = np.float32 if np.asarray(x).dtype == np.float32 else np.float64
+    x = np.asarray(x, dtype=dtype)
+    return x, np.empty(x.shape, dtype=dtype)
+
+
+## Hand back the caller's buffer, or a numpy scalar for 0-d results
+def _result(out, given):
+
+    return out if given is not None or out.ndim else out[()]
+
+
+## exp(-y^2) split as exp(-ysq^2) exp(-(y - ysq)(y + ysq)) to keep precision for large y
+def _exp_neg_square(y):
+
+    ysq = np.trunc(y * 16) / 16
+    return np.exp(-ysq * ysq) * np.exp(-(y - ysq) * (y + ysq))
+
+
+## Cody's erfc evaluated branch by branch into out; x and out may be the same array
+def _erfc_numpy(x, out):
+
+    y = np.abs(x)
+    negative = x < 0
+    missing = np.isnan(y)
+
+    ## |x| <= 0.46875: erfc = 1 - erf, erf = x P(x^2)/Q(x^2)
+    small = y <= _THRESHOLD
+    if np.any(small):
+        xs = x[small]
+        xsq = xs * xs
+        num, den = _A[4] * xsq, xsq.copy()
+        for i in range(3):
+            num += _A[i]
+            num *= xsq
+            den += _B[i]
+            den *= xsq
+        num += _A[3]
+        den += _B[3]
+        out[small] = 1 - xs * num / den
+
+    ## 0.46875 < |x| <= 4
+    mid = ~small & (y <= 4)
+    if np.any(mid):
+        ym = y[mid]
+        num, den = _C[8] * ym, ym.copy()
+        for i in range(7):
+            num += _C[i]
+            num *= ym
+            den += _D[i]
+            den *= ym
+        num += _C[7]
+        den += _D[7]
+        ## y^2 <= 16 here, so exp(-y^2) loses at most a few ulps without Cody's split
+        np.multiply(ym, ym, out=ym)
+        np.negative(ym, out=ym)
+        np.exp(ym, out=ym)
+        num /= den
+        num *= ym
+        out[mid] = num
+
+    ## |x| > 4, with erfc underflowing to 0 beyond 26.543
+    large = y > 4
+    if np.any(large):
+        yl = np.minimum(y[large], _XBIG)
+        inv = 1 / (yl * yl)
+        num, den = _P[5] * inv, inv.copy()
+        for i in range(4):
+            num += _P[i]
+            num *= inv
+            den += _Q[i]
+            den *= inv
+        num += _P[4]
+        den += _Q[4]
+        value = (_SQRT_PI_INV - inv * num / den) / yl * _exp_neg_square(yl)
+        value[yl >= _XBIG] = 0
+        out[large] = value
+
+    ## erfc(-y) = 2 - erfc(y) on the negative side, which the small branch already handles exactly
+    negative &= ~small
+    out[negative] = 2 - out[negative]
+    out[missing] = np.nan
+    return out
+
+
+## erfc of x into out with the pure NumPy kernels; x and out may be the same array
+def _erfc_into(x, out):
+
+    if x.size <= _SMALL:
+        out[...] = np.fromiter(map(math.erfc, x.ravel().tolist()), out.dtype, x.size).reshape(x.shape)
+    else:
+        _erfc_numpy(x, out)
+    return out
+
+
+## Complementary error function
+def erfc(x, out=None, dtype=None):
+
+    if out is None and dtype is None and np.ndim(x) == 0:
+        return np.float64(math.erfc(float(x)))
+
+    x, result = _prepare(x, out, dtype)
+    if _use_scipy():
+        import scipy.special
+        scipy.special.erfc(x, out=result)
+    else:
+        _erfc_into(x, result)
+    return _result(result, out)
+
+
+## Standard normal cdf, N(x) = erfc(-x / sqrt(2)) / 2
+def norm_cdf(x, out=None, dtype=None):
+
+    if out is None and dtype is None and np.ndim(x) == 0:
+        return np.float64(0.5 * math.erfc(-float(x) * _SQRT_HALF))
+
+    x, result = _prepare(x, out, dtype)
+    if _use_scipy():
+        import scipy.special
+        scipy.special.ndtr(x, out=result)
+        return _result(result, out)
+
+    np.multiply(x, -_SQRT_HALF, out=result)
+    _erfc_into(result, result)
+    result *= 0.5
+    return _result(result, out)
+
+
+## Standard normal pdf, n(x) = exp(-x^2 / 2) / sqrt(2 pi)
+def norm_pdf(x, out=None, dtype=None):
+
+    if out is None and dtype is None and np.ndim(x) == 0:
+        x = float(x)
+        return np.float64(_INV_SQRT_2PI * math.exp(-0.5 * x * x))
+
+    x, result = _prepare(x, out, dtype)
+    np.multiply(x, x, out=result)
+    result *= -0.5
+    np.exp(result, out=result)
+    result *= _INV_SQRT_2PI
+    return _result(result, out)
+
+
+## Largest absolute differences of the cdf and pdf from scipy.stats.norm over a grid, for validating a backend
+def max_abs_error(x=None, dtype=None):
+
+    if x is None:
+        x = np.linspace(-40, 40, 800001)
+    x = np.asarray(x, dtype=dtype or np.float64)
+    with np.errstate(all='ignore'):
+        ours = norm_cdf(x), norm_pdf(x)
+    from scipy.stats import norm
+    return {'cdf': float(np.max(np.abs(ours[0] - norm.cdf(x.astype(np.float64))))),
+            'pdf': float(np.max(np.abs(ours[1] - norm.pdf(x.astype(np.float64)))))}
@@ -0,0 +1,65 @@
+## Sensitivity sweeps: price/Greek cubes over any combination of input axes from one broadcast evaluation
+
+import numpy as np
+from BlackScholesModel.greeks import Greeks, greeks_batch
+
+AXES = ('spot', 'strike', 'days_to_expiry', 'rate', 'dividend', 'vol')
+
+
+## An N-dimensional grid of results with named dimensions and coordinates, in the spirit of an xarray Dataset
+class SweepCube:
+
+    def __init__(self, dims, coords, data):
+
+        self.dims = dims
+        self.coords = coords
+        self.data = data
+
+    def __getitem__(self, name):
+
+        return self.data[name]
+
+    @property
+    def shape(self):
+
+        return tuple(len(self.coords[d]) for d in self.dims)
+
+    ## Long-format frame with one row per grid point
+    def to_frame(self):
+
+        import pandas as pd
+        index = pd.MultiIndex.from_product([self.coords[d] for d in self.dims], names=list(self.dims))
+        return pd.DataFrame({name: np.ravel(values) for name, values in self.data.items()}, index=index)
+
+    ## Convert to an xarray Dataset, when xarray is installed
+    def to_xarray(self):
+
+        import xarray as xr
+        return xr.Dataset({name: (self.dims, values) for name, values in self.data.items()}, coords=self.coords)
+
+
+## Evaluate the given quantities over the outer product of the axes; every input not swept comes from base
+def sweep(base, axes, quantities=('price',)):
+
+    unknown = [name for name in axes if name not in AXES]
+    if unknown:
+        raise ValueError("Cannot sweep over %s; choose from %s" % (unknown, AXES))
+    unknown = [q for q in quantities if q not in Greeks._fields]
+    if unknown:
+        raise ValueError("Unknown quantities %s; choose from %s" % (unknown, Greeks._fields))
+
+    dims = tuple(axes)
+    coords = {name: np.asarray(values, dtype=float) for name, values in axes.items()}
+    inputs = {name: base[name] for name in AXES}
+
+    ## Axis i varies along dimension i only, so the kernel broadcasts them to the full grid
+    for i, name in enumerate(dims):
+        shape = [1] * len(dims)
+        shape[i] = -1
+        inputs[name] = coords[name].reshape(shape)
+
+    greeks = greeks_batch(inputs['spot'], inputs['strike'], inputs['days_to_expiry'], inputs['rate'],
+                          inputs['dividend'], inputs['vol'], base['call_or_put'])
+    grid_shape = tuple(len(coords[d]) for d in dims)
+    data = {q: np.broadcast_to(getattr(greeks, q), grid_shape) for q in quantities}
+    return SweepCube(dims, coords, data)
@@ -1,39 +1,65 @@
+import os
+import threading
 import pandas as pd
 import Utilities as ut
-from arch import arch_model
 import numpy as np
-import datetime as dt
+from Garch.model_cache import GarchModelCache, CachedFit
+from Garch.online import OnlineGarch
+from Garch.backtest import GarchBacktest
+from Utilities.instrumentation import instrument
 
 
+@instrument
 class Garch:
 
-    def __init__(self):
+    _model_cache = None
+    _lock = threading.Lock()
 
+    def __init__(self, trade_date=None, train_years=10, option_days=30):
+
+        self.trade_date = ut.Utilities.trade_date(trade_date)
+        self.train_start = self.trade_date - pd.DateOffset(years=train_years)
+        self.expiry = self.trade_date + pd.Timedelta(days=option_days)
         self.ann_option_vol = 0
         self.ann_realised_vol = 0
         self.vix = 0
         self.df_forecast = 0
 
+    ## A static method returning the process wide cache of fitted models, persisted beside the data cache
+    @staticmethod
+    def model_cache():
+
+        if Garch._model_cache is None:
+            with Garch._lock:
+                if Garch._model_cache is None:
+                    cache_dir = None
+                    if ut.Utilities.read_properties().get("cache_dir") is not None:
+                        cache_dir = os.path.join(ut.Utilities.getFilePath("cache_dir"), "garch")
+                    Garch._model_cache = GarchModelCache(cache_dir)
+        return Garch._model_cache
+
     ## Fetch train data from the SPX csv file
     def get_spx_data(self):
 
-        file_path = ut.Utilities.getFilePath("SPX")
-        df = pd.read_csv(file_path)
-        df['Date'] = pd.TimedeltaIndex(
-            df['Date'], unit='d') + dt.datetime(1899, 12, 30)
-        df = df.set_index('Date')
-        train_data = df.loc[pd.Timestamp(2005,8,12): pd.Timestamp(2015,8,12)].copy()
+        df = ut.Utilities.market_data().get("SPX")
+        train_data = df.loc[self.train_start:self.trade_date].copy()
         train_data['Log_Return'] = np.log(
             train_data['Adj Close']).diff().mul(100)
         train_data = train_data.dropna()
         return train_data['Log_Return']
 
-    ## Define the garch model
+    ## Define the garch model; fits are reused for as long as the training window is unchanged
     def garch_1_1(self):
 
-        model = arch_model(self.get_spx_data(), p=1, q=1,
-                           mean='constant', vol='GARCH', dist='normal')
-        return model.fit(update_freq=5)
+        return Garch.model_cache().fit(self.get_spx_data(), p=1, q=1, mean='constant',
+                                       dist='normal', update_freq=5).result
+
+    ## A streaming filter started from the cached fit, to be updated with closes after the training window
+    def online_garch(self, **kwargs):
+
+        returns = self.get_spx_data()
+        last_close = ut.Utilities.market_data().get("SPX").loc[returns.index[-1], 'Adj Close']
+        return OnlineGarch.from_fit(self.garch_1_1(), returns, last_close, **kwargs)
 
     ## Calculate the annualised forecasted voltality for option period
     def calc_ann_option_vol(self):
@@ -44,18 +70,13 @@ class Garch:
         self.df_forecast = self.df_forecast.transpose()
         timefactor = 252/len(self.df_forecast)
         self.ann_option_vol = np.sqrt(
-            timefactor*(np.sum(self.df_forecast[pd.Timestamp(2015, 8, 12)])))
+            timefactor*(np.sum(self.df_forecast.iloc[:, 0])))
         return self.ann_option_vol
 
     ## Calculate the annualised realised voltality for option period
     def calc_ann_realised_vol(self):
-        file_path = ut.Utilities.getFilePath("SPX")
-        df = pd.read_csv(file_path)
-        df['Date'] = pd.TimedeltaIndex(
-            df['Date'], unit='d') + dt.datetime(1899, 12, 30)
-        df = df.set_index('Date')
-        test_data = df.loc[pd.Timestamp(
-            2015, 8, 12): pd.Timestamp(2015, 9, 11)].copy()
+        df = ut.Utilities.market_data().get("SPX")
+        test_data = df.loc[self.trade_date:self.expiry].copy()
         test_data['Log_Return'] = np.log(
             test_data['Adj Close']).diff().mul(100)
         test_data = test_data.dropna()
@@ -70,11 +91,7 @@ class Garch:
     ## Fetch vix voltality from the vix file
     def calc_vix_vol(self):
 
-        file_path = ut.Utilities.getFilePath("VIX")
-        df = pd.read_csv(file_path)
-        df['Date'] = pd.TimedeltaIndex(
-            df['Date'], unit='d') + dt.datetime(1899, 12, 30)
-        df = df.set_index('Date')
-        self.vix = df.loc[pd.Timestamp(2015, 8, 12)]
+        df = ut.Utilities.market_data().get("VIX")
+        self.vix = df.loc[self.trade_date]
         self.vix = self.vix['Adj Close']
         return self.vix
\ No newline at end of file
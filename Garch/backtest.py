@@ -0,0 +1,107 @@
+## Rolling-window GARCH(1,1) forecast backtest over the SPX history, fitted across a process pool
+
+import os
+import csv
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from Garch.online import OnlineGarch
+
+COLUMNS = ['Date', 'Forecast Vol (%)', 'Realised Vol (%)', 'VIX', 'mu', 'omega', 'alpha', 'beta', 'Converged']
+
+
+## Fit every window ending in a chunk of forecast positions, warm starting each fit from the previous day's
+def _run_chunk(returns, dates, vix, positions, window, horizon):
+
+    from arch import arch_model
+    rows = []
+    starting_values = None
+
+    for i in positions:
+        train = pd.Series(returns[i - window + 1:i + 1])
+        model = arch_model(train, p=1, q=1, mean='constant', vol='GARCH', dist='normal')
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            result = model.fit(starting_values=starting_values, disp='off', show_warning=False)
+
+        converged = result.convergence_flag == 0
+        if converged:
+            starting_values = result.params.to_numpy()
+
+        ann_forecast = OnlineGarch.from_fit(result, train).ann_vol(horizon)
+        future = returns[i + 1:i + 1 + horizon]
+        ann_realised = np.sqrt(252/len(future) * np.sum(future**2))
+        params = result.params
+        rows.append([str(pd.Timestamp(dates[i]).date()), ann_forecast, ann_realised, vix[i],
+                     params['mu'], params['omega'], params['alpha[1]'], params['beta[1]'], int(converged)])
+
+    return rows
+
+
+class GarchBacktest:
+
+    def __init__(self, window=2520, horizon=22, workers=None, chunk_size=250):
+
+        self.window = window
+        self.horizon = horizon
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    ## SPX log returns (in %) with the VIX close on each return date
+    @staticmethod
+    def returns_and_vix(df_spx, df_vix):
+
+        returns = np.log(df_spx['Adj Close']).diff().mul(100).dropna()
+        vix = df_vix['Adj Close'].reindex(returns.index)
+        return returns, vix
+
+    ## Dates already written by an earlier, interrupted run
+    @staticmethod
+    def _done_dates(output_path):
+
+        if not os.path.exists(output_path):
+            return set()
+        return set(pd.read_csv(output_path, usecols=['Date'])['Date'].astype(str))
+
+    ## Roll the window through history, streaming forecast/realised/VIX rows to a csv as chunks complete
+    def run(self, df_spx, df_vix, output_path, start=None, end=None):
+
+        returns, vix = self.returns_and_vix(df_spx, df_vix)
+        dates = returns.index
+
+        ## A forecast needs a full window behind it and a full horizon of realised returns ahead
+        positions = np.arange(self.window - 1, len(returns) - self.horizon)
+        if start is not None:
+            positions = positions[dates[positions] >= pd.Timestamp(start)]
+        if end is not None:
+            positions = positions[dates[positions] <= pd.Timestamp(end)]
+
+        done = GarchBacktest._done_dates(output_path)
+        if done:
+            positions = np.array([i for i in positions if str(dates[i].date()) not in done], dtype=int)
+
+        chunks = [positions[i:i + self.chunk_size] for i in range(0, len(positions), self.chunk_size)]
+        values, date_values, vix_values = returns.to_numpy(), dates.to_numpy(), vix.to_numpy()
+
+        write_header = not os.path.exists(output_path)
+        with open(output_path, 'a', newline='') as out, ProcessPoolExecutor(self.workers) as pool:
+            writer = csv.writer(out)
+            if write_header:
+                writer.writerow(COLUMNS)
+
+            futures = [pool.submit(_run_chunk, values, date_values, vix_values, chunk, self.window, self.horizon)
+                       for chunk in chunks]
+            for future in futures:
+                writer.writerows(future.result())
+                out.flush()
+
+        return GarchBacktest.load(output_path)
+
+    ## Read a backtest table back, sorted by date
+    @staticmethod
+    def load(output_path):
+
+        df = pd.read_csv(output_path, parse_dates=['Date'])
+        return df.sort_values('Date').drop_duplicates('Date').set_index('Date')
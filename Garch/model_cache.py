@@ -0,0 +1,114 @@
+## A cache of fitted GARCH models keyed on the training returns and the model specification
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+
+## Fitted parameters and conditional variance of one model, plus the arch result they rebuild
+class CachedFit:
+
+    def __init__(self, params, conditional_variance, result):
+
+        self.params = params
+        self.conditional_variance = conditional_variance
+        self.result = result
+
+
+class GarchModelCache:
+
+    def __init__(self, cache_dir=None):
+
+        self.cache_dir = cache_dir
+        self._fits = {}
+        self._lock = threading.Lock()
+        self.fits = 0
+
+    ## Key of a fit: (returns hash, window start, window end, p, q, mean, dist)
+    @staticmethod
+    def key(returns, p, q, mean, dist):
+
+        values = np.ascontiguousarray(returns.to_numpy(dtype=float))
+        digest = hashlib.sha1(values.tobytes())
+        digest.update(GarchModelCache._index_bytes(returns.index))
+        start = str(returns.index[0]) if len(returns) else ''
+        end = str(returns.index[-1]) if len(returns) else ''
+        return (digest.hexdigest(), start, end, p, q, mean, dist)
+
+    ## Stable bytes of a returns index: epoch nanoseconds of its dates, or its labels as text if they are not
+    ## dates; the raw buffer of an object-dtype index holds pointers, which differ between processes
+    @staticmethod
+    def _index_bytes(index):
+
+        try:
+            return np.ascontiguousarray(pd.DatetimeIndex(index).asi8).tobytes()
+        except (TypeError, ValueError):
+            return '\n'.join(map(str, index)).encode()
+
+    ## File a fit is persisted under
+    def _path(self, key):
+
+        name = hashlib.sha1(json.dumps(key).encode()).hexdigest()[:24]
+        return os.path.join(self.cache_dir, 'garch-%s.npz' % name)
+
+    ## Rebuild a fitted result from stored parameters without re-running the MLE
+    @staticmethod
+    def _fix(returns, params, p, q, mean, dist):
+
+        from arch import arch_model
+        model = arch_model(returns, p=p, q=q, mean=mean, vol='GARCH', dist=dist)
+        return model.fix(params)
+
+    ## Read a persisted fit, if any
+    def _load(self, key, returns, p, q, mean, dist):
+
+        if self.cache_dir is None or not os.path.exists(self._path(key)):
+            return None
+
+        with np.load(self._path(key)) as stored:
+            params = pd.Series(stored['params'], index=stored['names'].tolist(), name='params')
+            variance = pd.Series(stored['variance'], index=returns.index, name='cond_var')
+
+        return CachedFit(params, variance, GarchModelCache._fix(returns, params, p, q, mean, dist))
+
+    ## Persist a fit next to the other caches
+    def _save(self, key, fit):
+
+        if self.cache_dir is None:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._path(key) + '.tmp.npz'
+        np.savez(tmp_path, params=fit.params.to_numpy(), names=np.array(fit.params.index, dtype=str),
+                 variance=fit.conditional_variance.to_numpy())
+        os.replace(tmp_path, self._path(key))
+
+    ## Return the cached fit of a model, fitting and storing it on a miss
+    def fit(self, returns, p=1, q=1, mean='constant', dist='normal', **fit_kwargs):
+
+        key = GarchModelCache.key(returns, p, q, mean, dist)
+
+        with self._lock:
+            cached = self._fits.get(key)
+            if cached is None:
+                cached = self._load(key, returns, p, q, mean, dist)
+
+            if cached is None:
+                from arch import arch_model
+                model = arch_model(returns, p=p, q=q, mean=mean, vol='GARCH', dist=dist)
+                result = model.fit(**fit_kwargs)
+                cached = CachedFit(result.params, result.conditional_volatility**2, result)
+                self.fits += 1
+                self._save(key, cached)
+
+            self._fits[key] = cached
+            return cached
+
+    ## Drop every in-memory fit
+    def clear(self):
+
+        with self._lock:
+            self._fits.clear()
@@ -0,0 +1,107 @@
+## A streaming GARCH(1,1) filter which updates the conditional variance in O(1) per new return
+
+import collections
+import numpy as np
+import pandas as pd
+
+
+class OnlineGarch:
+
+    def __init__(self, mu, omega, alpha, beta, variance, last_close=None, returns=None,
+                 window=2520, refit_every=None, drift_threshold=0.5, drift_halflife=20):
+
+        self.mu = mu
+        self.omega = omega
+        self.alpha = alpha
+        self.beta = beta
+        ## Conditional variance of the next, not yet observed, return
+        self.variance = variance
+        self.last_close = last_close
+        self.window = window
+        self.refit_every = refit_every
+        self.drift_threshold = drift_threshold
+        self.drift_decay = 0.5**(1/drift_halflife)
+        self.updates_since_fit = 0
+        self.drift = 1.0
+        self.returns = collections.deque(maxlen=window)
+        self.dates = collections.deque(maxlen=window)
+        if returns is not None:
+            self.returns.extend(returns.to_numpy(dtype=float))
+            self.dates.extend(returns.index)
+
+    ## Start the filter from a fitted arch result and the returns (in %) it was fitted on
+    @staticmethod
+    def from_fit(result, returns, last_close=None, **kwargs):
+
+        params = result.params
+        mu, omega = params['mu'], params['omega']
+        alpha, beta = params['alpha[1]'], params['beta[1]']
+        resid = returns.iloc[-1] - mu
+        variance = omega + alpha * resid**2 + beta * result.conditional_volatility.iloc[-1]**2
+        return OnlineGarch(mu, omega, alpha, beta, variance, last_close, returns, **kwargs)
+
+    ## Long run variance the forecasts revert to
+    def long_run_variance(self):
+
+        return self.omega / (1 - self.alpha - self.beta)
+
+    ## Feed one new log return (in %); updates the next-period variance and the drift monitor
+    def update(self, log_return, date=None):
+
+        resid = log_return - self.mu
+        ## Exponentially weighted mean of squared standardised residuals; stays near 1 while the model holds
+        self.drift = self.drift_decay * self.drift + (1 - self.drift_decay) * resid**2 / self.variance
+        self.variance = self.omega + self.alpha * resid**2 + self.beta * self.variance
+        self.updates_since_fit += 1
+        self.returns.append(log_return)
+        self.dates.append(date)
+        return self.variance
+
+    ## Feed one new close; the first close only seeds the filter
+    def update_close(self, close, date=None):
+
+        if self.last_close is None:
+            self.last_close = close
+            return self.variance
+
+        log_return = 100 * np.log(close / self.last_close)
+        self.last_close = close
+        return self.update(log_return, date)
+
+    ## Closed form variance forecasts for the next 1..horizon periods
+    def forecast(self, horizon):
+
+        persistence = self.alpha + self.beta
+        long_run = self.long_run_variance()
+        return long_run + persistence**np.arange(horizon) * (self.variance - long_run)
+
+    ## Annualised volatility (%) over the forecast horizon
+    def ann_vol(self, horizon=22):
+
+        return np.sqrt(252/horizon * np.sum(self.forecast(horizon)))
+
+    ## Whether the schedule is due or the residuals have drifted from the fitted model
+    def needs_refit(self):
+
+        if self.refit_every is not None and self.updates_since_fit >= self.refit_every:
+            return True
+        return abs(self.drift - 1) > self.drift_threshold
+
+    ## Trailing window of returns the filter has seen
+    def window_returns(self):
+
+        return pd.Series(list(self.returns), index=list(self.dates), name='Log_Return')
+
+    ## Re-estimate on the trailing window through the model cache and restart the filter from the new fit
+    def refit(self, model_cache, **fit_kwargs):
+
+        returns = self.window_returns()
+        result = model_cache.fit(returns, p=1, q=1, mean='constant', dist='normal', **fit_kwargs).result
+        params = result.params
+        self.mu, self.omega = params['mu'], params['omega']
+        self.alpha, self.beta = params['alpha[1]'], params['beta[1]']
+        resid = returns.iloc[-1] - self.mu
+        self.variance = self.omega + self.alpha * resid**2 + self.beta * result.conditional_volatility.iloc[-1]**2
+        self.updates_since_fit = 0
+        self.drift = 1.0
+        return result
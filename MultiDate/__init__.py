@@ -0,0 +1,101 @@
+## Evaluate spot, rates, dividends, implied vol, Garch(1,1) and the iron condor over many trade dates in one run
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import Utilities as ut
+import BlackScholesModel as bs
+import Garch as ga
+import OptionStrategy as OS
+
+COLUMNS = ['Spot', 'Interest Rate', 'Dividend Yield', 'Strike', 'IV', 'BSM Price', 'Mean Bid-Ask',
+           'Forecast Vol (%)', 'Realised Vol (%)', 'VIX', 'Iron Condor P&L ($)']
+
+
+## Trade dates in the option chain with a spot, a zero curve (from the same resolver as Utilities.yield_curve),
+## a dividend yield and, for Garch, a VIX close
+def available_dates(start=None, end=None, garch=True):
+
+    store = ut.Utilities.market_data()
+    dates = ut.Utilities.option_chain().trade_dates()
+    dates = dates[dates.isin(store.dates("SPX"))]
+    if garch:
+        dates = dates[dates.isin(store.dates("VIX"))]
+    first = store.dates("dividend")
+    dates = dates[dates >= first[0]] if len(first) else dates[:0]
+    dates = dates[[ut.Utilities.yield_curve_source(d) is not None for d in dates]]
+
+    if start is not None:
+        dates = dates[dates >= pd.Timestamp(start)]
+    if end is not None:
+        dates = dates[dates <= pd.Timestamp(end)]
+    return dates
+
+
+## Evaluate one trade date; top level so it can run in a worker process, where the market data store and
+## option chain are loaded once and shared by every date the process is given
+def evaluate_date(trade_date, days_to_expiry=30, moneyness=1.0, call_or_put=0, garch=True, strategy=True):
+
+    trade_date = pd.Timestamp(trade_date)
+    chain = ut.Utilities.option_chain()
+    row = dict.fromkeys(COLUMNS, np.nan)
+
+    spot = ut.Utilities.market_data().on_date("SPX", trade_date)['Adj Close'].iloc[0]
+    strike = chain.nearest_strike(trade_date, spot*moneyness, call_or_put)
+
+    bsm = bs.BSM(days_to_expiry, strike, call_or_put, trade_date)
+    bsm.calc_interest_rates()
+    bsm.calc_dividend()
+    bsm.calc_spotprice_SPX()
+    bsm.calc_implied_vol()
+    bsm.calc_option_value()
+    row.update({'Spot': bsm.spot_price, 'Interest Rate': bsm.interest_rates, 'Dividend Yield': bsm.dividend,
+                'Strike': strike, 'IV': bsm.iv, 'BSM Price': bsm.bsm_option_price, 'Mean Bid-Ask': bsm.mid_bid_ask})
+
+    if garch:
+        model = ga.Garch(trade_date, option_days=days_to_expiry)
+        row['Forecast Vol (%)'] = model.calc_ann_option_vol()
+        row['Realised Vol (%)'] = model.calc_ann_realised_vol()
+        row['VIX'] = model.calc_vix_vol()
+
+        if strategy:
+            builder = OS.OptionStrategyBuilder(bsm.spot_price, row['Forecast Vol (%)'], trade_date, days_to_expiry)
+            row['Iron Condor P&L ($)'] = builder.build_ironcondor()[1].loc['Value on expiry($)', 'Total']
+
+    return row
+
+
+class MultiDateEngine:
+
+    def __init__(self, days_to_expiry=30, moneyness=1.0, call_or_put=0, garch=True, strategy=True, workers=None):
+
+        self.config = {'days_to_expiry': days_to_expiry, 'moneyness': moneyness, 'call_or_put': call_or_put,
+                       'garch': garch, 'strategy': strategy}
+        self.workers = workers
+
+    ## Evaluate every available trade date in a range, or the given dates, one row per date; dates are
+    ## dispatched across a process pool in contiguous chunks, or run in-process when workers is 1
+    def run(self, dates=None, start=None, end=None):
+
+        if dates is None:
+            dates = available_dates(start, end, self.config['garch'])
+        dates = pd.DatetimeIndex(dates)
+
+        if self.workers == 1 or len(dates) <= 1:
+            rows = [evaluate_date(d, **self.config) for d in dates]
+        else:
+            workers = self.workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(workers) as pool:
+                chunksize = max(1, len(dates) // (4 * workers))
+                futures = pool.map(_evaluate_kwargs, [(d, self.config) for d in dates], chunksize=chunksize)
+                rows = list(futures)
+
+        return pd.DataFrame(rows, index=pd.DatetimeIndex(dates, name='Trade Date'), columns=COLUMNS)
+
+
+## Unpack a (date, config) pair for pool.map
+def _evaluate_kwargs(args):
+
+    trade_date, config = args
+    return evaluate_date(trade_date, **config)
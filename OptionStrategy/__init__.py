@@ -1,16 +1,23 @@
 ## A class that can formulate hedged strategies for options
 import Utilities as ut
+import Garch as ga
 import numpy as np
 import pandas as pd
-import datetime as dt
+from OptionStrategy.payoff import LEG_DTYPE, CALL, PUT, LONG, SHORT, Strategy, legs, intrinsic, stack, batch_pnl
+from OptionStrategy.payoff import straddle, strangle, butterfly, condor, iron_condor, calendar, ratio_spread
+from OptionStrategy.optimizer import garch_terminal_spots, expected_intrinsic, optimise_iron_condor
+from Utilities.instrumentation import instrument
 
 
+@instrument
 class OptionStrategyBuilder:
 
-    def __init__(self, spot, vol):
+    def __init__(self, spot, vol, trade_date=None, option_days=30):
 
         self.spot = spot
         self.forecasted_vol = vol
+        self.trade_date = ut.Utilities.trade_date(trade_date)
+        self.expiry = self.trade_date + pd.Timedelta(days=option_days)
 
     ## Calculates the 1 standard deviation monthly basis and finds appropriate strike prices to be sold
     def __calc_monthly_vol(self):
@@ -23,44 +30,35 @@ class OptionStrategyBuilder:
     ## Returns mean of bid-ask of the option prices for given strike and type of option
     def __get_strikes_option_prices(self, strike, option_type):
 
-        df_od = ut.Utilities.get_option_metric_data()
-        df_od = df_od.loc[(df_od['Strike'] == strike) & (
-            df_od["Put=1 Call=0"] == option_type)]
-        df_od = df_od.loc[df_od["Open Interest"]
-                          == df_od["Open Interest"].max()]
-        return np.mean(df_od[['Bid Price', 'Ask Price']].values)
+        quote = ut.Utilities.option_chain().quote(self.trade_date, strike, option_type)
+        if quote is None:
+            return np.nan
+        return quote.mid
 
     def __get_SPX_data_on_expiry(self):
 
-        file_path = ut.Utilities.getFilePath("SPX")
-        df = pd.read_csv(file_path)
-        df['Date'] = pd.TimedeltaIndex(
-            df['Date'], unit='d') + dt.datetime(1899, 12, 30)
-        return df.loc[df.Date == '2015-09-11', 'Close']
+        df = ut.Utilities.market_data().as_of("SPX", self.expiry)
+        return df['Close'].reset_index(drop=True)
 
     def long_call(self, S, K, Price):
         # Long Call Payoff
-        P = list(map(lambda x: max(x - K, 0) - Price, S))
-        return P
+        return np.maximum(np.asarray(S, dtype=float) - K, 0) - Price
 
     def long_put(self, S, K, Price):
         # Long Put Payoff
-        P = list(map(lambda x: max(K - x, 0) - Price, S))
-        return P
+        return np.maximum(K - np.asarray(S, dtype=float), 0) - Price
 
     def short_call(self, S, K, Price):
         # Payoff a shortcall is just the inverse of the payoff of a long call
-        P = self.long_call(S, K, Price)
-        return [-1.0*p for p in P]
+        return -self.long_call(S, K, Price)
 
     def short_put(self, S, K, Price):
         # Payoff a short put is just the inverse of the payoff of a long put
-        P = self.long_put(S, K, Price)
-        return [-1.0*p for p in P]
+        return -self.long_put(S, K, Price)
 
-    ## Defines the iron condor strategy based on suitable strike selection and buying the wings of a strangle
-
-    def ironcondor(self):
+    ## Defines the iron condor strategy based on suitable strike selection and buying the wings of a strangle;
+    ## returns the payoff over spot prices and the P&L table without plotting
+    def build_ironcondor(self):
 
         S = np.arange(self.spot*0.8, self.spot*1.2, self.spot *
                       0.01)  # Get a list of spot prices
@@ -75,31 +73,58 @@ class OptionStrategyBuilder:
         Price3 = self.__get_strikes_option_prices(E3, 0)
         Price4 = self.__get_strikes_option_prices(E4, 1)
 
-        P_1 = self.short_call(S, E1, Price1)
-        P_2 = self.short_put(S, E2, Price2)
-        P_3 = self.long_call(S, E3, Price3)
-        P_4 = self.long_put(S, E4, Price4)
-        pd_os = pd.DataFrame({"Spot Price": S, "Iron Condor Payoff ($)": [
-                             a+b+c+d for a, b, c, d in zip(P_1, P_2, P_3, P_4)]})
-        ut.Utilities.plot_chart(pd_os)
+        condor = iron_condor(E4, E2, E1, E3, Price4, Price2, Price1, Price3)
+        pd_os = pd.DataFrame({"Spot Price": S, "Iron Condor Payoff ($)": condor.pnl(S)})
 
         ## Iron Condor Implemetation: Value Tables
 
         close = self.__get_SPX_data_on_expiry()
-        EP_1 = self.short_call(close, E1, Price1)
-        EP_2 = self.short_put(close, E2, Price2)
-        EP_3 = self.long_call(close, E3, Price3)
-        EP_4 = self.long_put(close, E4, Price4)
+        ## Legs are ordered short call, short put, long call, long put
+        cost = -condor.weights() * condor.legs['premium']
+        value_on_expiry = condor.leg_pnl(close.to_numpy()[:1])[0]
 
-        short_call_lst = [Price1, EP_1[0]]
-        short_put_lst = [Price2, EP_2[0]]
-        long_call_lst = [-Price3, EP_3[0]]
-        long_put_lst = [-Price4, EP_4[0]]
+        short_call_lst = [cost[0], value_on_expiry[0]]
+        short_put_lst = [cost[1], value_on_expiry[1]]
+        long_call_lst = [cost[2], value_on_expiry[2]]
+        long_put_lst = [cost[3], value_on_expiry[3]]
 
-        price_beg = Price1 + Price2 - Price3 - Price4
-        price_expiry = EP_1[0]+EP_2[0]+EP_3[0]+EP_4[0]
+        price_beg = cost.sum()
+        price_expiry = value_on_expiry.sum()
 
         dict_pl = {"Short Call": short_call_lst, "Short Put": short_put_lst,
                    "Long Call": long_call_lst, "Long Put": long_put_lst, "Total": [price_beg, price_expiry]}
 
-        return pd.DataFrame(dict_pl, index=['Cost($)', 'Value on expiry($)'])
+        return pd_os, pd.DataFrame(dict_pl, index=['Cost($)', 'Value on expiry($)'])
+
+    ## Searches one expiry's chain for the top-k iron condors by expected P&L under the Garch(1,1) forecast
+    ## distribution of the spot on that expiry; by default the listed expiry nearest the builder's own
+    def optimise_ironcondor(self, top_k=10, max_loss=None, min_credit=0.0, max_width=None, n_paths=20000, seed=None,
+                            expiry=None):
+
+        chain = ut.Utilities.option_chain()
+        listed = [e for e in chain.expiries(self.trade_date) if e > self.trade_date]
+        if expiry is None:
+            if not listed:
+                raise LookupError("No option expiries listed after %s" % self.trade_date.date())
+            expiry = min(listed, key=lambda e: abs(e - self.expiry))
+        expiry = pd.Timestamp(expiry)
+        if expiry not in listed:
+            raise LookupError("No options listed on %s expiring %s" % (self.trade_date.date(), expiry.date()))
+
+        ## The GARCH horizon is the trading days from the trade date to the expiry
+        steps = max(int(np.busday_count(self.trade_date.date(), expiry.date())), 1)
+        online = ga.Garch(self.trade_date).online_garch()
+        terminal = garch_terminal_spots(self.spot, online.mu, online.omega, online.alpha, online.beta,
+                                        online.variance, steps, n_paths, seed)
+
+        call_strikes, call_rows = chain.slice(self.trade_date, 0, expiry)
+        put_strikes, put_rows = chain.slice(self.trade_date, 1, expiry)
+        return optimise_iron_condor(call_strikes, chain.mid[call_rows], put_strikes, chain.mid[put_rows], terminal,
+                                    self.spot, top_k, max_loss, min_credit, max_width)
+
+    ## Plots the iron condor payoff and returns its P&L table
+    def ironcondor(self):
+
+        pd_os, df_pl = self.build_ironcondor()
+        ut.Utilities.plot_chart(pd_os)
+        return df_pl
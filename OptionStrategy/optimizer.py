@@ -0,0 +1,131 @@
+## Strike selection over the whole chain: score every feasible iron condor by expected P&L, max loss and credit
+
+import numpy as np
+import pandas as pd
+from BlackScholesModel.monte_carlo import garch_paths
+
+COLUMNS = ['Long Put', 'Short Put', 'Short Call', 'Long Call', 'Credit ($)', 'Max Loss ($)', 'Expected P&L ($)']
+
+
+## Terminal spots after steps trading days, simulated from GARCH(1,1) parameters as fitted by Garch
+def garch_terminal_spots(spot, mu, omega, alpha, beta, variance, steps, n_paths=20000, seed=None):
+
+    rng = np.random.default_rng(seed)
+    return garch_paths(spot, mu, omega, alpha, beta, variance, steps, n_paths, rng)[:, -1]
+
+
+## Expected call and put intrinsic value at every strike under equally weighted terminal spots
+def expected_intrinsic(terminal_spots, strikes):
+
+    spots = np.sort(np.asarray(terminal_spots, dtype=float))
+    strikes = np.asarray(strikes, dtype=float)
+    n = len(spots)
+
+    ## E[(S-K)+] from the tail sums of the sorted spots; puts follow from E[(K-S)+] = E[(S-K)+] - E[S] + K
+    tail = np.r_[np.cumsum(spots[::-1])[::-1], 0.0]
+    above = np.searchsorted(spots, strikes, side='right')
+    calls = (tail[above] - strikes * (n - above)) / n
+    puts = calls - spots.mean() + strikes
+    return calls, puts
+
+
+## Every credit spread on one side of the condor as columns of short/long indexes, credit, width and expected P&L
+def _spreads(strikes, prices, expected, short_above, max_width):
+
+    lower, upper = np.triu_indices(len(strikes), k=1)
+    short, long = (lower, upper) if short_above else (upper, lower)
+
+    credit = prices[short] - prices[long]
+    width = np.abs(strikes[long] - strikes[short])
+    keep = credit > 0
+    if max_width is not None:
+        keep &= width <= max_width
+
+    short, long, credit, width = short[keep], long[keep], credit[keep], width[keep]
+    pnl = credit - expected[short] + expected[long]
+
+    ## Best expected P&L first, so the search can stop once no remaining spread can reach the top k
+    order = np.argsort(-pnl, kind='stable')
+    return short[order], long[order], credit[order], width[order], pnl[order]
+
+
+## Top-k short iron condors over the call and put chains, ranked by expected P&L under the terminal spots;
+## combinations are scored a block of call spreads against every put spread at a time, and the search
+## stops as soon as the best remaining call spread plus the best put spread cannot beat the k-th result
+def optimise_iron_condor(call_strikes, call_prices, put_strikes, put_prices, terminal_spots, spot=None,
+                         top_k=10, max_loss=None, min_credit=0.0, max_width=None, block=256):
+
+    call_strikes, call_prices = np.asarray(call_strikes, dtype=float), np.asarray(call_prices, dtype=float)
+    put_strikes, put_prices = np.asarray(put_strikes, dtype=float), np.asarray(put_prices, dtype=float)
+
+    ## Quotes without a price cannot be traded
+    quoted = ~np.isnan(call_prices)
+    call_strikes, call_prices = call_strikes[quoted], call_prices[quoted]
+    quoted = ~np.isnan(put_prices)
+    put_strikes, put_prices = put_strikes[quoted], put_prices[quoted]
+
+    call_expected = expected_intrinsic(terminal_spots, call_strikes)[0]
+    put_expected = expected_intrinsic(terminal_spots, put_strikes)[1]
+
+    sc, lc, c_credit, c_width, c_pnl = _spreads(call_strikes, call_prices, call_expected, True, max_width)
+    sp, lp, p_credit, p_width, p_pnl = _spreads(put_strikes, put_prices, put_expected, False, max_width)
+
+    ## Short strikes out of the money when a spot is given
+    if spot is not None:
+        keep = call_strikes[sc] >= spot
+        sc, lc, c_credit, c_width, c_pnl = sc[keep], lc[keep], c_credit[keep], c_width[keep], c_pnl[keep]
+        keep = put_strikes[sp] <= spot
+        sp, lp, p_credit, p_width, p_pnl = sp[keep], lp[keep], p_credit[keep], p_width[keep], p_pnl[keep]
+
+    ## A side whose own wing loses more than the limit even with the largest credit on the other side is infeasible
+    if max_loss is not None and len(sc) and len(sp):
+        keep = c_width - c_credit - p_credit.max() <= max_loss
+        sc, lc, c_credit, c_width, c_pnl = sc[keep], lc[keep], c_credit[keep], c_width[keep], c_pnl[keep]
+        keep = p_width - p_credit - c_credit.max() <= max_loss
+        sp, lp, p_credit, p_width, p_pnl = sp[keep], lp[keep], p_credit[keep], p_width[keep], p_pnl[keep]
+
+    best_score = np.empty(0)
+    best_call = np.empty(0, dtype=np.intp)
+    best_put = np.empty(0, dtype=np.intp)
+
+    for start in range(0, len(sc), block):
+        threshold = best_score.min() if len(best_score) == top_k else -np.inf
+        if len(sp) == 0 or c_pnl[start] + p_pnl[0] <= threshold:
+            break
+
+        ## Put spreads that cannot beat the threshold with the best call spread in this block are skipped
+        n_put = len(sp) if threshold == -np.inf else np.searchsorted(-p_pnl, c_pnl[start] - threshold, 'left')
+        stop = min(start + block, len(sc))
+        rows, cols = slice(start, stop), slice(0, n_put)
+
+        credit = c_credit[rows, None] + p_credit[None, cols]
+        score = c_pnl[rows, None] + p_pnl[None, cols]
+        feasible = (call_strikes[sc[rows], None] >= put_strikes[sp[None, cols]]) & (credit >= min_credit)
+        if max_loss is not None:
+            feasible &= np.maximum(c_width[rows, None], p_width[None, cols]) - credit <= max_loss
+        score = np.where(feasible & (score > threshold), score, -np.inf)
+
+        flat = score.ravel()
+        k = min(top_k, flat.size)
+        if k == 0:
+            continue
+        top = np.argpartition(-flat, k - 1)[:k]
+        top = top[np.isfinite(flat[top])]
+        call_idx, put_idx = np.unravel_index(top, score.shape)
+
+        best_score = np.r_[best_score, flat[top]]
+        best_call = np.r_[best_call, call_idx + start]
+        best_put = np.r_[best_put, put_idx]
+        order = np.argsort(-best_score, kind='stable')[:top_k]
+        best_score, best_call, best_put = best_score[order], best_call[order], best_put[order]
+
+    credit = c_credit[best_call] + p_credit[best_put]
+    return pd.DataFrame({
+        'Long Put': put_strikes[lp[best_put]],
+        'Short Put': put_strikes[sp[best_put]],
+        'Short Call': call_strikes[sc[best_call]],
+        'Long Call': call_strikes[lc[best_call]],
+        'Credit ($)': credit,
+        'Max Loss ($)': np.maximum(c_width[best_call], p_width[best_put]) - credit,
+        'Expected P&L ($)': best_score,
+    }, columns=COLUMNS)
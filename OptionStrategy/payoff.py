@@ -0,0 +1,156 @@
+## Vectorised multi-leg option strategies: legs as a compact structured array, payoffs as one matrix operation
+
+import numpy as np
+from BlackScholesModel.batch import price_batch
+
+## call_or_put follows 'Put=1 Call=0'; side is +1 long, -1 short; expiry is in days from today
+LEG_DTYPE = np.dtype([('call_or_put', np.int8), ('side', np.int8), ('strike', np.float64),
+                      ('quantity', np.float64), ('premium', np.float64), ('expiry', np.float64)])
+
+CALL = 0
+PUT = 1
+LONG = 1
+SHORT = -1
+
+
+## Build a leg array from (call_or_put, side, strike, quantity, premium[, expiry]) tuples
+def legs(*rows):
+
+    return np.array([tuple(row) + (0.0,) * (6 - len(row)) for row in rows], dtype=LEG_DTYPE)
+
+
+## Intrinsic value of every leg at every spot; shape (..., n_spot, n_legs)
+def intrinsic(leg_array, spots):
+
+    spots = np.asarray(spots, dtype=float)[..., None]
+    sign = np.where(leg_array['call_or_put'] == CALL, 1.0, -1.0)
+    return np.maximum(sign * (spots - leg_array['strike']), 0)
+
+
+class Strategy:
+
+    def __init__(self, leg_array, name=''):
+
+        self.legs = np.asarray(leg_array, dtype=LEG_DTYPE)
+        self.name = name
+
+    ## Signed position size of each leg
+    def weights(self):
+
+        return self.legs['side'] * self.legs['quantity']
+
+    ## Net premium paid to open; negative for a credit
+    def cost(self):
+
+        return self.weights() @ self.legs['premium']
+
+    ## Value of each leg at the horizon; legs expiring later are valued with BSM over their remaining life
+    def leg_values(self, spots, horizon=None, rate=0.0, dividend=0.0, vol=None):
+
+        values = intrinsic(self.legs, spots)
+        if horizon is None:
+            return values
+
+        remaining = self.legs['expiry'] - horizon
+        alive = remaining > 0
+        if np.any(alive):
+            if vol is None:
+                raise ValueError("legs expiring after the horizon need a vol to be valued")
+            spots = np.asarray(spots, dtype=float)[..., None]
+            values[..., alive] = price_batch(spots, self.legs['strike'][alive], remaining[alive], rate,
+                                             dividend, vol, self.legs['call_or_put'][alive])
+        return values
+
+    ## P&L of each leg over the spots; shape (n_spot, n_legs)
+    def leg_pnl(self, spots, **kwargs):
+
+        return (self.leg_values(spots, **kwargs) - self.legs['premium']) * self.weights()
+
+    ## Payoff over a spot grid as one matrix-vector product
+    def payoff(self, spots, **kwargs):
+
+        return self.leg_values(spots, **kwargs) @ self.weights()
+
+    ## P&L over a spot grid, net of premiums
+    def pnl(self, spots, **kwargs):
+
+        return self.payoff(spots, **kwargs) - self.cost()
+
+    ## Maximum loss and gain over a spot grid
+    def extremes(self, spots, **kwargs):
+
+        pnl = self.pnl(spots, **kwargs)
+        return pnl.min(), pnl.max()
+
+
+## Stack strategies into one (n_strategies, max_legs) leg array, padding with zero-quantity legs
+def stack(strategies):
+
+    width = max(len(s.legs) for s in strategies)
+    stacked = np.zeros((len(strategies), width), dtype=LEG_DTYPE)
+    for i, s in enumerate(strategies):
+        stacked[i, :len(s.legs)] = s.legs
+    return stacked
+
+
+## Expiry P&L of many strategies over one spot grid in a single einsum; shape (n_strategies, n_spot)
+def batch_pnl(stacked, spots):
+
+    weights = stacked['side'] * stacked['quantity']
+    spots = np.asarray(spots, dtype=float)
+    sign = np.where(stacked['call_or_put'] == CALL, 1.0, -1.0)
+    values = np.maximum(sign[:, None, :] * (spots[None, :, None] - stacked['strike'][:, None, :]), 0)
+    return np.einsum('snl,sl->sn', values, weights) - np.sum(weights * stacked['premium'], axis=1)[:, None]
+
+
+## Long (side=1) or short (side=-1) straddle
+def straddle(strike, call_premium, put_premium, side=LONG, quantity=1):
+
+    return Strategy(legs((CALL, side, strike, quantity, call_premium),
+                         (PUT, side, strike, quantity, put_premium)), 'Straddle')
+
+
+## Long or short strangle of an out-of-the-money put and call
+def strangle(put_strike, call_strike, put_premium, call_premium, side=LONG, quantity=1):
+
+    return Strategy(legs((PUT, side, put_strike, quantity, put_premium),
+                         (CALL, side, call_strike, quantity, call_premium)), 'Strangle')
+
+
+## Long butterfly: long the wings, short twice the body
+def butterfly(low, mid, high, low_premium, mid_premium, high_premium, call_or_put=CALL, quantity=1):
+
+    return Strategy(legs((call_or_put, LONG, low, quantity, low_premium),
+                         (call_or_put, SHORT, mid, 2*quantity, mid_premium),
+                         (call_or_put, LONG, high, quantity, high_premium)), 'Butterfly')
+
+
+## Long condor over four strikes of one option type
+def condor(k1, k2, k3, k4, p1, p2, p3, p4, call_or_put=CALL, quantity=1):
+
+    return Strategy(legs((call_or_put, LONG, k1, quantity, p1), (call_or_put, SHORT, k2, quantity, p2),
+                         (call_or_put, SHORT, k3, quantity, p3), (call_or_put, LONG, k4, quantity, p4)), 'Condor')
+
+
+## Short iron condor: short strangle inside, long wings outside
+def iron_condor(long_put, short_put, short_call, long_call, long_put_premium, short_put_premium,
+                short_call_premium, long_call_premium, quantity=1):
+
+    return Strategy(legs((CALL, SHORT, short_call, quantity, short_call_premium),
+                         (PUT, SHORT, short_put, quantity, short_put_premium),
+                         (CALL, LONG, long_call, quantity, long_call_premium),
+                         (PUT, LONG, long_put, quantity, long_put_premium)), 'Iron Condor')
+
+
+## Calendar spread: short the near expiry, long the far expiry at the same strike
+def calendar(strike, near_expiry, far_expiry, near_premium, far_premium, call_or_put=CALL, quantity=1):
+
+    return Strategy(legs((call_or_put, SHORT, strike, quantity, near_premium, near_expiry),
+                         (call_or_put, LONG, strike, quantity, far_premium, far_expiry)), 'Calendar')
+
+
+## Ratio spread: long one at the first strike, short `ratio` at the second
+def ratio_spread(long_strike, short_strike, long_premium, short_premium, ratio=2, call_or_put=CALL, quantity=1):
+
+    return Strategy(legs((call_or_put, LONG, long_strike, quantity, long_premium),
+                         (call_or_put, SHORT, short_strike, ratio*quantity, short_premium)), 'Ratio Spread')
@@ -0,0 +1,286 @@
+## A headless batch pricing service over HTTP/JSON, coalescing concurrent small requests into one vectorised evaluation
+
+import json
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from BlackScholesModel.greeks import Greeks, greeks_batch
+from BlackScholesModel.implied_vol import implied_vol_batch
+
+FIELDS = ('spot', 'strike', 'days_to_expiry', 'rate', 'dividend', 'vol', 'call_or_put')
+
+
+## Raised when the queue of pending contracts is full; clients should back off and retry
+class ServiceBusy(Exception):
+    pass
+
+
+## Turn a request body, either a list of contract objects or a dict of columns, into float columns
+def parse_contracts(body):
+
+    contracts = body.get('contracts', body) if isinstance(body, dict) else body
+    if isinstance(contracts, list):
+        for i, c in enumerate(contracts):
+            if not isinstance(c, dict):
+                raise ValueError("contract %d is not an object" % i)
+        contracts = {name: [c.get(name) for c in contracts] for name in FIELDS + ('market_price',)}
+    elif not isinstance(contracts, dict):
+        raise ValueError("expected a list of contracts or a dict of columns")
+
+    missing = [name for name in FIELDS if name not in contracts and name != 'vol']
+    if missing:
+        raise ValueError("missing fields %s" % missing)
+
+    ## Scalars broadcast against the list fields, so the batch is as long as the longest of them
+    try:
+        n = np.broadcast(*[np.asarray(contracts[name], dtype=object) for name in FIELDS + ('market_price',)
+                           if contracts.get(name) is not None]).size
+    except ValueError:
+        raise ValueError("fields have different numbers of values")
+    columns = {}
+    for name in FIELDS + ('market_price',):
+        values = contracts.get(name)
+        if values is None:
+            values = [None] * n
+        elif not isinstance(values, list):
+            values = [values] * n
+        if len(values) != n:
+            raise ValueError("field '%s' has %d values, expected %d" % (name, len(values), n))
+        columns[name] = np.array([np.nan if v is None else v for v in values], dtype=float)
+
+    ## Every contract, whichever form it came in, needs each field and a vol or a market_price to value it at
+    for name in FIELDS:
+        if name != 'vol' and np.any(np.isnan(columns[name])):
+            raise ValueError("contract %d is missing '%s'" % (np.flatnonzero(np.isnan(columns[name]))[0], name))
+    unpriced = np.flatnonzero(np.isnan(columns['vol']) & np.isnan(columns['market_price']))
+    if len(unpriced):
+        raise ValueError("contract %d needs a vol or a market_price" % unpriced[0])
+    bad_type = np.flatnonzero((columns['call_or_put'] != 0) & (columns['call_or_put'] != 1))
+    if len(bad_type):
+        raise ValueError("contract %d has call_or_put %r, expected 0 (call) or 1 (put)"
+                         % (bad_type[0], columns['call_or_put'][bad_type[0]].item()))
+    return columns
+
+
+## Price, Greeks and, where a market price is given, implied vol of one set of columns
+def evaluate(columns):
+
+    results = {}
+    market_price = columns['market_price']
+    quoted = ~np.isnan(market_price)
+    iv = np.full(len(market_price), np.nan)
+
+    if np.any(quoted):
+        iv[quoted] = implied_vol_batch(market_price[quoted], columns['spot'][quoted], columns['strike'][quoted],
+                                       columns['days_to_expiry'][quoted], columns['rate'][quoted],
+                                       columns['dividend'][quoted], columns['call_or_put'][quoted]).iv
+    results['iv'] = iv
+
+    ## Contracts without a vol are valued at their implied vol
+    vol = np.where(np.isnan(columns['vol']), iv, columns['vol'])
+    greeks = greeks_batch(columns['spot'], columns['strike'], columns['days_to_expiry'], columns['rate'],
+                          columns['dividend'], vol, columns['call_or_put'])
+    for name in Greeks._fields:
+        results[name] = np.atleast_1d(getattr(greeks, name))
+    return results
+
+
+class RequestCoalescer:
+
+    def __init__(self, window=0.002, max_batch=100000, max_pending=500000):
+
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._queue = []
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self._worker = threading.Thread(target=self._run, name='pricing-coalescer', daemon=True)
+        self._worker.start()
+
+    ## Queue a set of columns; returns a future for its results, or raises ServiceBusy when the queue is full
+    def submit(self, columns):
+
+        n = len(columns['strike'])
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("coalescer is closed")
+            if self._pending + n > self.max_pending:
+                raise ServiceBusy("%d contracts pending" % self._pending)
+            self._queue.append((columns, n, future))
+            self._pending += n
+            self._cond.notify()
+        return future
+
+    ## Take everything that arrives within the window, up to max_batch contracts
+    def _take_batch(self):
+
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return []
+
+            deadline = time.monotonic() + self.window
+            while time.monotonic() < deadline and sum(n for _, n, _ in self._queue) < self.max_batch:
+                self._cond.wait(deadline - time.monotonic())
+
+            batch, size = [], 0
+            while self._queue and (not batch or size + self._queue[0][1] <= self.max_batch):
+                item = self._queue.pop(0)
+                batch.append(item)
+                size += item[1]
+            self._pending -= size
+            return batch
+
+    ## Evaluate each coalesced batch once and hand every request its slice of the results
+    def _run(self):
+
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+
+            try:
+                merged = {name: np.concatenate([c[name] for c, _, _ in batch]) for name in batch[0][0]}
+                results = evaluate(merged)
+                self.batches += 1
+            except Exception as exc:
+                for _, _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            start = 0
+            for _, n, future in batch:
+                future.set_result({name: values[start:start + n] for name, values in results.items()})
+                start += n
+
+    def close(self):
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def _reply(self, status, payload):
+
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+
+        if self.path == '/health':
+            self._reply(200, {'status': 'ok', 'batches': self.server.coalescer.batches})
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+
+        if self.path != '/price':
+            self._reply(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            columns = parse_contracts(json.loads(self.rfile.read(length)))
+            results = self.server.coalescer.submit(columns).result(self.server.timeout_seconds)
+        except ServiceBusy as exc:
+            self._reply(503, {'error': str(exc)})
+            return
+        except FutureTimeout:
+            self._reply(504, {'error': 'pricing timed out'})
+            return
+        except (ValueError, TypeError, KeyError, AttributeError) as exc:
+            self._reply(400, {'error': str(exc)})
+            return
+
+        self._reply(200, {name: [None if np.isnan(v) else v for v in values.tolist()]
+                          for name, values in results.items()})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class PricingService:
+
+    def __init__(self, host='127.0.0.1', port=8000, window=0.002, max_batch=100000, max_pending=500000,
+                 timeout_seconds=30):
+
+        self.coalescer = RequestCoalescer(window, max_batch, max_pending)
+        self.server = _Server((host, port), _Handler)
+        self.server.coalescer = self.coalescer
+        self.server.timeout_seconds = timeout_seconds
+        self._thread = None
+
+    @property
+    def url(self):
+
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    ## Serve on a background thread, e.g. in-process for local testing
+    def start(self):
+
+        self._thread = threading.Thread(target=self.server.serve_forever, name='pricing-http', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+
+        self.server.serve_forever()
+
+    def stop(self):
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.coalescer.close()
+
+    def __enter__(self):
+
+        return self.start()
+
+    def __exit__(self, *exc):
+
+        self.stop()
+
+
+## Command line entry point: python -m PricingService [--host HOST] [--port PORT]
+def main(argv=None):
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m PricingService')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--window', type=float, default=0.002, help='seconds to wait for requests to coalesce')
+    parser.add_argument('--max-batch', type=int, default=100000)
+    parser.add_argument('--max-pending', type=int, default=500000)
+    parser.add_argument('--timeout', type=float, default=30, help='seconds a request may wait for its result')
+    args = parser.parse_args(argv)
+
+    service = PricingService(args.host, args.port, args.window, args.max_batch, args.max_pending, args.timeout)
+    print('Serving on %s' % service.url, flush=True)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+    return 0
@@ -0,0 +1,4 @@
+import sys
+from PricingService import main
+
+sys.exit(main())
@@ -1,22 +1,172 @@
 ## Class for using any utility function, mostly contains static method
 
 import os
+import threading
 from jproperties import Properties
 import pandas as pd
-from scipy.stats import norm
-import streamlit as st
+from Utilities.market_data import MarketDataStore
+from Utilities.columnar_cache import ColumnarCache
+from Utilities.option_chain import OptionChain, Quote
+from Utilities.yield_curve import YieldCurve
+from Utilities import instrumentation
+from Utilities.instrumentation import instrument, timed, span, record_rows
+from Utilities.vol_surface import VolSurface, SviCache, SVI_FIELDS, svi_total_variance, fit_svi, slice_data
+from BlackScholesModel.special import norm_cdf, norm_pdf
 
 
+@instrument
 class Utilities:
 
+    _configs = None
+    _configs_stamp = None
+    _market_data = None
+    _yield_curves = {}
+    _svi_cache = None
+    _lock = threading.Lock()
+
+    ## Trade date used when none is given, the date of the original one-day study
+    TRADE_DATE = pd.Timestamp(2015, 8, 12)
+
+    ## A static method normalising an optional trade date
+    @staticmethod
+    def trade_date(date=None):
+
+        if date is None:
+            return Utilities.TRADE_DATE
+        return pd.Timestamp(date)
+
+    ## A static method returning the process wide market data store
+    @staticmethod
+    def market_data():
+
+        if Utilities._market_data is None:
+            with Utilities._lock:
+                if Utilities._market_data is None:
+                    cache = None
+                    if Utilities.read_properties().get("cache_dir") is not None:
+                        cache = ColumnarCache(Utilities.getFilePath("cache_dir"))
+                    Utilities._market_data = MarketDataStore(Utilities.getFilePath, cache)
+        return Utilities._market_data
+
+    ## A static method converting every configured csv to its binary columnar cache
+    @staticmethod
+    def convert_data_files():
+
+        store = Utilities.market_data()
+        for key in ("SPX", "VIX", "dividend", "iv", "interest_rates"):
+            if os.path.exists(Utilities.getFilePath(key)):
+                store.get(key)
+
+    ## A static method returning the indexed option chain, rebuilt only when the data file changes
+    @staticmethod
+    def option_chain():
+
+        return Utilities.market_data().derived("iv", "option_chain", OptionChain.from_frame)
+
+    ## A static method resolving the zero curve serving a date: the latest registered or file curve on or before it,
+    ## a registered one winning ties, else the generated curve configured in env.properties; returns (source, curve
+    ## date) with source 'registered', 'file' or 'generated', or None when nothing serves the date
+    @staticmethod
+    def yield_curve_source(date):
+
+        date = pd.Timestamp(date)
+        registered = [d for d in Utilities._yield_curves if d <= date]
+        latest = max(registered) if registered else None
+
+        configs = Utilities.read_properties()
+        if configs.get("interest_rates") is not None and os.path.exists(Utilities.getFilePath("interest_rates")):
+            file_date = Utilities.market_data().last_date("interest_rates", date)
+            if file_date is not None and (latest is None or file_date > latest):
+                return 'file', file_date
+
+        if latest is not None:
+            return 'registered', latest
+        if configs.get("generated_curve") is not None:
+            return 'generated', None
+        return None
+
+    ## A static method returning the zero curve serving a date, built once per curve date
+    @staticmethod
+    def yield_curve(date, interpolation='linear'):
+
+        source = Utilities.yield_curve_source(date)
+        if source is None:
+            raise KeyError("no zero curve on or before %s" % pd.Timestamp(date).date())
+        source, curve_date = source
+
+        if source == 'registered':
+            curve = Utilities._yield_curves[curve_date]
+        elif source == 'generated':
+            beta0, beta1, beta2, tau = [float(v) for v in
+                                        Utilities.read_properties().get("generated_curve").data.split(',')]
+            curve = YieldCurve.nelson_siegel(beta0, beta1, beta2, tau, interpolation=interpolation)
+        else:
+            def build(df):
+                return YieldCurve.from_frame(df.loc[df['Date'] == curve_date], interpolation)
+
+            return Utilities.market_data().derived("interest_rates", ("yield_curve", curve_date, interpolation), build)
+
+        if curve.interpolation != interpolation:
+            curve = YieldCurve(curve.days, curve.rates, interpolation)
+        return curve
+
+    ## A static method returning the process wide cache of SVI fits, persisted beside the data cache
+    @staticmethod
+    def svi_cache():
+
+        if Utilities._svi_cache is None:
+            with Utilities._lock:
+                if Utilities._svi_cache is None:
+                    cache_dir = None
+                    if Utilities.read_properties().get("cache_dir") is not None:
+                        cache_dir = os.path.join(Utilities.getFilePath("cache_dir"), "vol_surface")
+                    Utilities._svi_cache = SviCache(cache_dir)
+        return Utilities._svi_cache
+
+    ## A static method returning the fitted volatility surface of a trade date, built once per date
+    @staticmethod
+    def vol_surface(trade_date=None, workers=None):
+
+        trade_date = Utilities.trade_date(trade_date)
+        chain = Utilities.option_chain()
+
+        def build(df):
+            spot = Utilities.market_data().on_date("SPX", trade_date)['Adj Close'].iloc[0]
+            return VolSurface.from_chain(chain, trade_date, spot, Utilities.svi_cache(), workers)
+
+        return Utilities.market_data().derived("iv", ("vol_surface", trade_date), build)
+
+    ## A static method fitting the surfaces of many trade dates, with every smile fitted across one process pool
+    @staticmethod
+    def vol_surfaces(trade_dates, workers=None):
+
+        chain = Utilities.option_chain()
+        trade_dates = [pd.Timestamp(d) for d in trade_dates]
+        spots = [Utilities.market_data().on_date("SPX", d)['Adj Close'].iloc[0] for d in trade_dates]
+        slices = [[slice_data(chain, d, expiry, spot) for expiry in chain.expiries(d)]
+                  for d, spot in zip(trade_dates, spots)]
+
+        ## Fit every smile together, then let each surface pick its fits up from the cache
+        Utilities.svi_cache().fit_many([s[2:] for date_slices in slices for s in date_slices
+                                        if len(s[2]) >= len(SVI_FIELDS)], workers)
+        surfaces = {}
+        for d, spot, date_slices in zip(trade_dates, spots, slices):
+            surface = VolSurface.from_slices(spot, date_slices, Utilities.svi_cache())
+            surfaces[d] = Utilities.market_data().derived("iv", ("vol_surface", d), lambda df: surface)
+        return surfaces
+
+    ## A static method to use a generated curve from a date on, e.g. when no zero curve file is available
+    @staticmethod
+    def register_yield_curve(date, curve):
+
+        Utilities._yield_curves[pd.Timestamp(date)] = curve
+
     ## A static method to fetch option metric data
     @staticmethod
-    def get_option_metric_data():
+    def get_option_metric_data(trade_date=None):
 
-        file_path = Utilities.getFilePath("iv")
-        df = pd.read_csv(file_path)
-        df_od = df.loc[(df['Trade dAte'] == '12/08/2015') &
-                       (df["Implied Vol"] != -99.99)].copy()
+        df = Utilities.market_data().on_date("iv", Utilities.trade_date(trade_date))
+        df_od = df.loc[df["Implied Vol"] != -99.99].copy()
         df_od.loc[:, 'Strike x 1000'] = df_od['Strike x 1000'].div(1000)
         df_od = df_od.rename(columns={"Strike x 1000": "Strike"})
         df_od = df_od.reset_index()
@@ -31,72 +181,45 @@ class Utilities:
         file_path = os.getcwd() + configs.get(sub_path).data
         return file_path
 
-    #### A static method to read the environment properties file ####
+    #### A static method to read the environment properties file, re-read only when it changes ####
     @staticmethod
     def read_properties():
 
-        configs = Properties()
+        st_prop = os.stat('env.properties')
+        stamp = (os.getcwd(), st_prop.st_mtime_ns, st_prop.st_size)
 
-        with open('env.properties', 'rb') as read_prop:
-            configs.load(read_prop)
+        if Utilities._configs is None or Utilities._configs_stamp != stamp:
+            configs = Properties()
 
-        return configs
+            with open('env.properties', 'rb') as read_prop:
+                configs.load(read_prop)
+
+            Utilities._configs = configs
+            Utilities._configs_stamp = stamp
+
+        return Utilities._configs
 
 ## A static method to get given strike prices from data
     @staticmethod
-    def get_strike_prices(option_type):
+    def get_strike_prices(option_type, trade_date=None):
 
-        df_od = Utilities.get_option_metric_data()
-        df_od = df_od.loc[df_od['Put=1 Call=0'] == option_type]
-        return [i for i in df_od['Strike']]
+        return Utilities.option_chain().strikes(Utilities.trade_date(trade_date), option_type).tolist()
 
     ## A static method to return normal distribution cdf
     @staticmethod
     def N(x):
 
-        return norm.cdf(x)
+        return norm_cdf(x)
 
     ## A static method to return normal distribution pdf
     @staticmethod
     def n(x):
 
-        return norm.pdf(x)
+        return norm_pdf(x)
 
-    ## A static method to plot charts
+    ## A static method to plot charts, streamlit is only imported by the plotting module
     @staticmethod
     def plot_chart(df_plot):
 
-        if 'Interest rate' in df_plot:
-            st.line_chart(df_plot, x="Interest rate",
-                          y="Black Scholes Option Price")
-
-        if 'Days to Expiry' in df_plot:
-            st.line_chart(df_plot, x="Days to Expiry",
-                          y="Black Scholes Option Price")
-
-        if 'Intrinsic Value of Option' in df_plot:
-            st.line_chart(df_plot, x="Spot Price", y={
-                          "Black Scholes Option Price", "Intrinsic Value of Option"})
-
-        if 'Implied Volatility (%)' in df_plot:
-            st.line_chart(df_plot, x="Implied Volatility (%)",
-                          y="Black Scholes Option Price")
-
-        if '1st-Order Taylor-Series Approximation' in df_plot:
-            st.line_chart(df_plot, x="Spot Price", y={
-                           "Black Scholes Option Price", "1st-Order Taylor-Series Approximation", "2nd-Order Taylor-Series Approximation"})
-
-        if pd.Timestamp(2015, 8, 12) in df_plot:
-            df_plot = df_plot.rename(columns={df_plot.columns[0]: 'Daily Forecast Volatility (%)'})
-            st.line_chart(df_plot)                   
-
-        if 'Delta' in df_plot:
-            df_plot['DTE'] = -df_plot['DTE']
-            st.line_chart(df_plot, x="DTE", y="Delta")
-
-        if 'Cum. P&L ($)' in df_plot:
-            df_plot['DTE'] = -df_plot['DTE']
-            st.line_chart(df_plot, x="DTE")
-        
-        if 'Iron Condor Payoff ($)' in df_plot:
-            st.line_chart(df_plot,x="Spot Price",y="Iron Condor Payoff ($)")
+        from Utilities.plotting import plot_chart
+        plot_chart(df_plot)
@@ -0,0 +1,101 @@
+## A typed, memory-mapped .npy cache of parsed csv files, keyed on the hash of the source file
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+_INDEX_COLUMN = '__index__'
+
+
+class ColumnarCache:
+
+    def __init__(self, cache_dir):
+
+        self.cache_dir = cache_dir
+
+    ## Content hash of a source file
+    @staticmethod
+    def file_hash(file_path):
+
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as source:
+            for chunk in iter(lambda: source.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    ## Directory holding the cache of one version of a source file
+    def _cache_path(self, file_path, file_hash):
+
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(self.cache_dir, '%s-%s' % (name, file_hash[:16]))
+
+    ## Memory-map a cached frame; all columns come back as read-only arrays
+    @staticmethod
+    def _read(path):
+
+        with open(os.path.join(path, 'meta.json')) as read_meta:
+            meta = json.load(read_meta)
+
+        columns = {}
+        for i, col in enumerate(meta['columns']):
+            columns[col] = np.load(os.path.join(path, '%d.npy' % i), mmap_mode='r')
+
+        index = None
+        if _INDEX_COLUMN in columns:
+            index = pd.Index(columns.pop(_INDEX_COLUMN), name=meta['index_name'], copy=False)
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    ## Write a frame as one .npy file per column, then publish the directory atomically
+    def _write(self, path, df):
+
+        frame = df
+        index_name = None
+        if not isinstance(df.index, pd.RangeIndex):
+            index_name = df.index.name
+            frame = df.reset_index(names=_INDEX_COLUMN)
+
+        if any(dtype == object for dtype in frame.dtypes):
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            for i, col in enumerate(frame.columns):
+                np.save(os.path.join(tmp_path, '%d.npy' % i), frame[col].to_numpy())
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as write_meta:
+                json.dump({'columns': list(frame.columns), 'index_name': index_name}, write_meta)
+            os.rename(tmp_path, path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+        return True
+
+    ## Remove caches of older versions of a source file
+    def _prune(self, file_path, keep):
+
+        prefix = os.path.splitext(os.path.basename(file_path))[0] + '-'
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(prefix) and path != keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    ## Load a parsed frame from the cache, falling back to parser(file_path) and caching its result
+    def load(self, file_path, parser):
+
+        path = self._cache_path(file_path, ColumnarCache.file_hash(file_path))
+
+        if os.path.isdir(path):
+            try:
+                return ColumnarCache._read(path)
+            except (OSError, ValueError, KeyError):
+                shutil.rmtree(path, ignore_errors=True)
+
+        df = parser(file_path)
+        if self._write(path, df):
+            self._prune(file_path, path)
+            return ColumnarCache._read(path)
+        return df
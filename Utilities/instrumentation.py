@@ -0,0 +1,194 @@
+## Lightweight timing instrumentation: call counts, wall and CPU time and rows loaded per stage, recorded into an
+## in-process registry and exported as JSON or Prometheus text. Timing is on process wide after enable(), or only on
+## the threads that set a collector; otherwise a timed call costs a flag and a thread-local check
+
+import os
+import json
+import time
+import threading
+import functools
+
+
+class _State:
+
+    enabled = os.environ.get('OPTION_PRICING_PROFILE', '').lower() in ('1', 'true', 'on', 'yes')
+
+
+## Per-thread collector; a class default keeps the disabled check a plain attribute read
+class _Local(threading.local):
+
+    collector = None
+
+
+_local = _Local()
+
+
+class Registry:
+
+    FIELDS = ('calls', 'wall_seconds', 'cpu_seconds', 'max_wall_seconds', 'rows')
+
+    def __init__(self):
+
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _add(self, name, calls, wall, cpu, rows):
+
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = [0, 0.0, 0.0, 0.0, 0]
+            stats[0] += calls
+            stats[1] += wall
+            stats[2] += cpu
+            stats[3] = max(stats[3], wall)
+            stats[4] += rows
+
+    ## Stage name to its counters
+    def snapshot(self):
+
+        with self._lock:
+            return {name: dict(zip(Registry.FIELDS, stats)) for name, stats in sorted(self._stats.items())}
+
+    def reset(self):
+
+        with self._lock:
+            self._stats.clear()
+
+    def to_json(self, **kwargs):
+
+        return json.dumps(self.snapshot(), **kwargs)
+
+    ## Prometheus text exposition format, one counter family per field and a stage label per series
+    def to_prometheus(self, prefix='option_pricing'):
+
+        snapshot = self.snapshot()
+        families = (('calls', 'calls_total', 'counter', 'Calls of the stage'),
+                    ('wall_seconds', 'wall_seconds_total', 'counter', 'Wall-clock seconds spent in the stage'),
+                    ('cpu_seconds', 'cpu_seconds_total', 'counter', 'CPU seconds spent in the stage'),
+                    ('max_wall_seconds', 'max_wall_seconds', 'gauge', 'Slowest single call of the stage'),
+                    ('rows', 'rows_loaded_total', 'counter', 'Rows loaded by the stage'))
+        lines = []
+        for field, metric, kind, text in families:
+            lines.append('# HELP %s_%s %s' % (prefix, metric, text))
+            lines.append('# TYPE %s_%s %s' % (prefix, metric, kind))
+            for name, stats in snapshot.items():
+                label = name.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append('%s_%s{stage="%s"} %r' % (prefix, metric, label, stats[field]))
+        return '\n'.join(lines) + '\n'
+
+
+## The process wide registry
+REGISTRY = Registry()
+
+
+def enable():
+
+    _State.enabled = True
+
+
+def disable():
+
+    _State.enabled = False
+
+
+def is_enabled():
+
+    return _State.enabled
+
+
+## Time this thread's stages, even with timing disabled process wide, and also record them into a second registry,
+## e.g. one per app rerun; None stops collecting
+def set_collector(registry):
+
+    _local.collector = registry
+
+
+def _record(name, calls, wall, cpu, rows):
+
+    REGISTRY._add(name, calls, wall, cpu, rows)
+    collector = _local.collector
+    if collector is not None:
+        collector._add(name, calls, wall, cpu, rows)
+
+
+## Count rows loaded by a stage
+def record_rows(name, rows):
+
+    if _State.enabled or _local.collector is not None:
+        _record(name, 0, 0.0, 0.0, int(rows))
+
+
+class _Span:
+
+    def __init__(self, name):
+
+        self.name = name
+
+    def __enter__(self):
+
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+
+        _record(self.name, 1, time.perf_counter() - self._wall, time.thread_time() - self._cpu, 0)
+        return False
+
+
+class _NoSpan:
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+## Context manager timing a block as one call of a stage
+def span(name):
+
+    if not _State.enabled and _local.collector is None:
+        return _NO_SPAN
+    return _Span(name)
+
+
+## Decorator timing every call of a function as a stage, named after the function when no name is given
+def timed(name=None):
+
+    def decorate(func):
+        stage = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _State.enabled and _local.collector is None:
+                return func(*args, **kwargs)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(stage, 1, time.perf_counter() - wall, time.thread_time() - cpu, 0)
+
+        return wrapper
+
+    return decorate
+
+
+## Class decorator timing every public method, static method included, as '<Class>.<method>'
+def instrument(cls):
+
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_'):
+            continue
+        stage = '%s.%s' % (cls.__name__, attr)
+        if isinstance(value, staticmethod):
+            setattr(cls, attr, staticmethod(timed(stage)(value.__func__)))
+        elif callable(value) and not isinstance(value, type):
+            setattr(cls, attr, timed(stage)(value))
+    return cls
@@ -0,0 +1,193 @@
+## An in-memory store which parses each project csv once per process and hands out read-only views
+
+import os
+import threading
+import datetime as dt
+import numpy as np
+import pandas as pd
+from Utilities.instrumentation import instrument, span, record_rows
+
+EXCEL_EPOCH = dt.datetime(1899, 12, 30)
+
+
+## A cached, parsed csv along with the file stamp it was parsed from
+class _Entry:
+
+    def __init__(self, stamp, frame, date_index):
+
+        self.stamp = stamp
+        self.frame = frame
+        self.date_index = date_index
+        self.derived = {}
+
+
+@instrument
+class MarketDataStore:
+
+    def __init__(self, path_resolver, cache=None):
+
+        self._path_resolver = path_resolver
+        self._cache = cache
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+
+    ## Convert an array of excel serial day numbers to timestamps
+    @staticmethod
+    def excel_to_datetime(serial):
+
+        return pd.to_datetime(np.asarray(serial, dtype=float), unit='D', origin=EXCEL_EPOCH)
+
+    ## Convert 'dd/mm/yyyy' strings to timestamps
+    @staticmethod
+    def dmy_to_datetime(values):
+
+        return pd.to_datetime(values, format='%d/%m/%Y')
+
+    ## Rebuild a frame on top of read-only column arrays so shared data cannot be written in place
+    @staticmethod
+    def _freeze(df):
+
+        columns = {}
+        for col in df.columns:
+            values = df[col].to_numpy()
+            if values.flags.writeable:
+                values = values.copy()
+                values.flags.writeable = False
+            columns[col] = values
+        index = df.index.copy()
+        frozen = pd.DataFrame(columns, index=index, copy=False)
+        return frozen
+
+    ## Daily price files (SPX, VIX) keyed on an excel serial date
+    @staticmethod
+    def _parse_daily_prices(file_path):
+
+        df = pd.read_csv(file_path)
+        df['Date'] = MarketDataStore.excel_to_datetime(df['Date'])
+        return df.set_index('Date').sort_index()
+
+    ## Dividend yield and zero curve files keyed on a 'dd/mm/yyyy' date
+    @staticmethod
+    def _parse_dated_table(file_path):
+
+        df = pd.read_csv(file_path, encoding='utf-8-sig')
+        df['Date'] = MarketDataStore.dmy_to_datetime(df['Date'])
+        return df.sort_values('Date', kind='stable').reset_index(drop=True)
+
+    ## OptionMetrics file, sorted and indexed on trade date
+    @staticmethod
+    def _parse_option_data(file_path):
+
+        df = pd.read_csv(file_path)
+        df['Trade dAte'] = MarketDataStore.dmy_to_datetime(df['Trade dAte'])
+        df['Expiry Date'] = MarketDataStore.dmy_to_datetime(df['Expiry Date'])
+        return df.sort_values('Trade dAte', kind='stable').reset_index(drop=True)
+
+    ## Map every date to the (start, stop) row slice it occupies in a date-sorted frame
+    @staticmethod
+    def _build_date_index(dates):
+
+        values = dates.to_numpy()
+        if len(values) == 0:
+            return {}
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        stops = np.r_[starts[1:], len(values)]
+        return {pd.Timestamp(values[s]): (s, e) for s, e in zip(starts, stops)}
+
+    ## Parser and the column rows are grouped on (None when the frame is indexed on date)
+    _PARSERS = {
+        "SPX": ("_parse_daily_prices", None),
+        "VIX": ("_parse_daily_prices", None),
+        "dividend": ("_parse_dated_table", "Date"),
+        "interest_rates": ("_parse_dated_table", "Date"),
+        "iv": ("_parse_option_data", "Trade dAte"),
+        "option_data": ("_parse_option_data", "Trade dAte"),
+    }
+
+    ## Return the parsed entry for a property key, re-parsing only if the file changed on disk
+    def _entry(self, key):
+
+        file_path = self._path_resolver(key)
+        st = os.stat(file_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry.stamp == stamp:
+                return entry
+
+            parser_name, date_column = MarketDataStore._PARSERS[key]
+            parser = getattr(MarketDataStore, parser_name)
+            with span("MarketDataStore.load.%s" % key):
+                if self._cache is None:
+                    df = parser(file_path)
+                else:
+                    df = self._cache.load(file_path, parser)
+            record_rows("MarketDataStore.load.%s" % key, len(df))
+
+            date_index = None
+            if date_column is not None:
+                date_index = MarketDataStore._build_date_index(df[date_column])
+            entry = _Entry(stamp, MarketDataStore._freeze(df), date_index)
+            self._entries[file_path] = entry
+            self.loads += 1
+            return entry
+
+    ## Read-only view of a full data set
+    def get(self, key):
+
+        return self._entry(key).frame.copy(deep=False)
+
+    ## Read-only view of the rows of a data set on a given date
+    def on_date(self, key, date):
+
+        entry = self._entry(key)
+        date = pd.Timestamp(date)
+
+        if entry.date_index is None:
+            return entry.frame.loc[[date]] if date in entry.frame.index else entry.frame.iloc[0:0]
+
+        start, stop = entry.date_index.get(date, (0, 0))
+        return entry.frame.iloc[start:stop]
+
+    ## All dates the data set is indexed on, sorted once per load
+    def dates(self, key):
+
+        entry = self._entry(key)
+        if entry.date_index is None:
+            return entry.frame.index
+        return self.derived(key, "dates", lambda frame: pd.DatetimeIndex(sorted(entry.date_index)))
+
+    ## Latest date in a data set on or before the given one, or None if the data starts later
+    def last_date(self, key, date):
+
+        dates = self.dates(key)
+        i = dates.searchsorted(pd.Timestamp(date), side='right') - 1
+        return dates[i] if i >= 0 else None
+
+    ## Rows of the latest date on or before the given one, for data not published every trading day
+    def as_of(self, key, date):
+
+        last = self.last_date(key, date)
+        if last is None:
+            return self._entry(key).frame.iloc[0:0]
+        return self.on_date(key, last)
+
+    ## Structure built from a data set by builder(frame), cached until the underlying file changes
+    def derived(self, key, name, builder):
+
+        entry = self._entry(key)
+        with self._lock:
+            if name not in entry.derived:
+                entry.derived[name] = builder(entry.frame)
+            return entry.derived[name]
+
+    ## Drop one or all cached entries
+    def invalidate(self, key=None):
+
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._path_resolver(key), None)
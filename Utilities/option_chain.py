@@ -0,0 +1,176 @@
+## A columnar option chain with hashed and sorted indexes over (trade date, expiry, type, strike)
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+Quote = namedtuple('Quote', ['trade_date', 'expiry', 'call_or_put', 'strike', 'bid', 'ask', 'mid',
+                             'iv', 'delta', 'open_interest', 'vega', 'volume'])
+
+_COLUMNS = {
+    'trade_date': 'Trade dAte',
+    'expiry': 'Expiry Date',
+    'call_or_put': 'Put=1 Call=0',
+    'bid': 'Bid Price',
+    'ask': 'Ask Price',
+    'volume': 'Volume',
+    'iv': 'Implied Vol',
+    'delta': 'Delta ',
+    'open_interest': 'Open Interest',
+    'vega': 'Vega',
+}
+
+
+## Integer nanosecond key for a date-like value
+def _day(date):
+
+    return pd.Timestamp(date).value
+
+
+class OptionChain:
+
+    def __init__(self, columns):
+
+        for name, values in columns.items():
+            values = np.ascontiguousarray(values)
+            values.flags.writeable = False
+            setattr(self, name, values)
+
+        self.mid = self.__tied_mid()
+        self.mid.flags.writeable = False
+        self.__build_indexes()
+
+    ## Build the chain from an OptionMetrics frame, dropping quotes without an implied vol
+    @staticmethod
+    def from_frame(df_od, drop_missing_iv=True):
+
+        if drop_missing_iv:
+            df_od = df_od.loc[df_od['Implied Vol'] != -99.99]
+
+        columns = {name: df_od[col].to_numpy() for name, col in _COLUMNS.items()}
+        columns['trade_date'] = columns['trade_date'].astype('datetime64[ns]').astype(np.int64)
+        columns['expiry'] = columns['expiry'].astype('datetime64[ns]').astype(np.int64)
+        columns['call_or_put'] = columns['call_or_put'].astype(np.int8)
+        if 'Strike' in df_od:
+            columns['strike'] = df_od['Strike'].to_numpy(dtype=float)
+        else:
+            columns['strike'] = df_od['Strike x 1000'].to_numpy(dtype=float)/1000
+        for name in ('bid', 'ask', 'iv', 'delta', 'open_interest', 'vega', 'volume'):
+            columns[name] = columns[name].astype(float)
+
+        return OptionChain(columns)
+
+    ## Starting positions of each run of equal keys in lexsorted order
+    @staticmethod
+    def __group_starts(*keys):
+
+        change = np.zeros(len(keys[0]), dtype=bool)
+        if len(change):
+            change[0] = True
+        for key in keys:
+            change[1:] |= key[1:] != key[:-1]
+        return np.flatnonzero(change)
+
+    ## Mid bid-ask of every row, averaged over the rows quoting the same contract with the same open interest, so
+    ## a lookup that ties on max open interest prices at the mean of the tied quotes
+    def __tied_mid(self):
+
+        mid = 0.5*(self.bid + self.ask)
+        order = np.lexsort((self.open_interest, self.expiry, self.strike, self.call_or_put, self.trade_date))
+        starts = OptionChain.__group_starts(*[a[order] for a in (self.trade_date, self.call_or_put, self.strike,
+                                                                 self.expiry, self.open_interest)])
+        if len(starts) == len(mid):
+            return mid
+
+        counts = np.diff(np.r_[starts, len(mid)])
+        means = np.add.reduceat(mid[order], starts)/counts
+        mid[order] = np.repeat(means, counts)
+        return mid
+
+    ## Hash the max-open-interest row of every contract and keep strikes sorted per (date, type)
+    def __build_indexes(self):
+
+        ## Highest open interest first within each key; ties keep file order
+        order = np.lexsort((-self.open_interest, self.expiry, self.strike, self.call_or_put, self.trade_date))
+        td, ex, cp, k = (self.trade_date[order], self.expiry[order],
+                         self.call_or_put[order], self.strike[order])
+        rows = order[OptionChain.__group_starts(td, cp, k, ex)]
+        self._contract = {key: int(i) for key, i in zip(
+            zip(self.trade_date[rows].tolist(), self.expiry[rows].tolist(),
+                self.call_or_put[rows].tolist(), self.strike[rows].tolist()), rows)}
+
+        order = np.lexsort((-self.open_interest, self.strike, self.call_or_put, self.trade_date))
+        td, cp, k = self.trade_date[order], self.call_or_put[order], self.strike[order]
+        rows = order[OptionChain.__group_starts(td, cp, k)]
+        self._max_oi = {key: int(i) for key, i in zip(
+            zip(self.trade_date[rows].tolist(), self.call_or_put[rows].tolist(),
+                self.strike[rows].tolist()), rows)}
+
+        self._strikes = {}
+        starts = OptionChain.__group_starts(self.trade_date[rows], self.call_or_put[rows])
+        stops = np.r_[starts[1:], len(rows)]
+        for start, stop in zip(starts, stops):
+            strikes = self.strike[rows[start:stop]]
+            strikes.flags.writeable = False
+            key = (int(self.trade_date[rows[start]]), int(self.call_or_put[rows[start]]))
+            self._strikes[key] = strikes
+
+    ## Row index of the max-open-interest quote for a strike, optionally for one expiry only
+    def row(self, trade_date, strike, call_or_put, expiry=None):
+
+        if expiry is None:
+            return self._max_oi.get((_day(trade_date), int(call_or_put), float(strike)))
+        return self._contract.get((_day(trade_date), _day(expiry), int(call_or_put), float(strike)))
+
+    ## The max-open-interest quote for a strike, or None if it is not in the data
+    def quote(self, trade_date, strike, call_or_put, expiry=None):
+
+        i = self.row(trade_date, strike, call_or_put, expiry)
+        if i is None:
+            return None
+        return Quote(pd.Timestamp(self.trade_date[i]), pd.Timestamp(self.expiry[i]),
+                     int(self.call_or_put[i]), self.strike[i], self.bid[i], self.ask[i], self.mid[i],
+                     self.iv[i], self.delta[i], self.open_interest[i], self.vega[i], self.volume[i])
+
+    ## Whether the chain quotes a strike on a trade date
+    def has_strike(self, trade_date, strike, call_or_put):
+
+        return (_day(trade_date), int(call_or_put), float(strike)) in self._max_oi
+
+    ## Sorted unique strikes quoted on a trade date
+    def strikes(self, trade_date, call_or_put):
+
+        return self._strikes.get((_day(trade_date), int(call_or_put)), np.empty(0))
+
+    ## Sorted strikes and the rows of their max-open-interest quotes, optionally for one expiry only
+    def slice(self, trade_date, call_or_put, expiry=None):
+
+        strikes = self.strikes(trade_date, call_or_put)
+        if expiry is not None:
+            rows = [self.row(trade_date, k, call_or_put, expiry) for k in strikes.tolist()]
+            strikes = np.array([k for k, i in zip(strikes, rows) if i is not None])
+            return strikes, np.array([i for i in rows if i is not None], dtype=np.intp)
+        rows = np.array([self.row(trade_date, k, call_or_put) for k in strikes.tolist()], dtype=np.intp)
+        return strikes, rows
+
+    ## Nearest quoted strike to a target, found by binary search
+    def nearest_strike(self, trade_date, target, call_or_put):
+
+        strikes = self.strikes(trade_date, call_or_put)
+        if len(strikes) == 0:
+            return None
+        i = np.clip(np.searchsorted(strikes, target), 1, len(strikes) - 1) if len(strikes) > 1 else 0
+        if len(strikes) > 1 and abs(strikes[i - 1] - target) <= abs(strikes[i] - target):
+            i -= 1
+        return strikes[i]
+
+    ## Expiries quoted on a trade date
+    def expiries(self, trade_date):
+
+        expiries = np.unique(self.expiry[self.trade_date == _day(trade_date)])
+        return [pd.Timestamp(e) for e in expiries]
+
+    ## All trade dates in the chain
+    def trade_dates(self):
+
+        return pd.DatetimeIndex(np.unique(self.trade_date))
@@ -0,0 +1,44 @@
+## Streamlit charts for the app, kept apart from the numerical packages
+
+import pandas as pd
+import streamlit as st
+
+
+## Plot a frame with the chart its columns call for
+def plot_chart(df_plot):
+
+    if 'Interest rate' in df_plot:
+        st.line_chart(df_plot, x="Interest rate",
+                      y="Black Scholes Option Price")
+
+    if 'Days to Expiry' in df_plot:
+        st.line_chart(df_plot, x="Days to Expiry",
+                      y="Black Scholes Option Price")
+
+    if 'Intrinsic Value of Option' in df_plot:
+        st.line_chart(df_plot, x="Spot Price", y={
+                      "Black Scholes Option Price", "Intrinsic Value of Option"})
+
+    if 'Implied Volatility (%)' in df_plot:
+        st.line_chart(df_plot, x="Implied Volatility (%)",
+                      y="Black Scholes Option Price")
+
+    if '1st-Order Taylor-Series Approximation' in df_plot:
+        st.line_chart(df_plot, x="Spot Price", y={
+                       "Black Scholes Option Price", "1st-Order Taylor-Series Approximation", "2nd-Order Taylor-Series Approximation"})
+
+    ## Garch forecasts are a single column named by their forecast date
+    if len(df_plot.columns) == 1 and isinstance(df_plot.columns[0], pd.Timestamp):
+        df_plot = df_plot.rename(columns={df_plot.columns[0]: 'Daily Forecast Volatility (%)'})
+        st.line_chart(df_plot)                   
+
+    if 'Delta' in df_plot:
+        df_plot['DTE'] = -df_plot['DTE']
+        st.line_chart(df_plot, x="DTE", y="Delta")
+
+    if 'Cum. P&L ($)' in df_plot:
+        df_plot['DTE'] = -df_plot['DTE']
+        st.line_chart(df_plot, x="DTE")
+    
+    if 'Iron Condor Payoff ($)' in df_plot:
+        st.line_chart(df_plot,x="Spot Price",y="Iron Condor Payoff ($)")
@@ -0,0 +1,260 @@
+## Implied volatility surfaces: a raw SVI smile per expiry, interpolated in total variance across expiries
+
+import os
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+DAYS_IN_YEAR = 365
+SVI_FIELDS = ('a', 'b', 'rho', 'm', 'sigma')
+
+
+## Raw SVI total variance w(k) = a + b(rho(k - m) + sqrt((k - m)^2 + sigma^2)); params broadcast over leading axes
+def svi_total_variance(params, k):
+
+    a, b, rho, m, sigma = np.moveaxis(np.asarray(params, dtype=float), -1, 0)
+    x = np.asarray(k, dtype=float) - m
+    return a + b * (rho * x + np.sqrt(x * x + sigma * sigma))
+
+
+## Least-squares SVI fit of total variances at log-moneyness k, with the minimum variance kept non-negative;
+## residuals are in root total variance, i.e. proportional to vol, so the far wings do not swamp the money
+def fit_svi(k, w, weights=None):
+
+    k, w = np.asarray(k, dtype=float), np.asarray(w, dtype=float)
+    weights = np.ones_like(w) if weights is None else np.sqrt(np.asarray(weights, dtype=float))
+    root_w = np.sqrt(w)
+
+    def residuals(params):
+        a, b, rho, m, sigma = params
+        floor = a + b * sigma * np.sqrt(1 - rho * rho)
+        model = np.sqrt(np.maximum(svi_total_variance(params, k), 0.0))
+        return np.r_[weights * (model - root_w), 10 * max(0.0, -floor)]
+
+    ## Analytic Jacobian; a numerical one costs six residual evaluations per step
+    def jacobian(params):
+        a, b, rho, m, sigma = params
+        x = k - m
+        root = np.sqrt(x * x + sigma * sigma)
+        model = np.sqrt(np.maximum(svi_total_variance(params, k), 1e-12))
+        scale = (weights / (2 * model))[:, None]
+        jac = np.empty((len(k) + 1, 5))
+        jac[:-1] = scale * np.column_stack([np.ones_like(x), rho * x + root, b * x, -b * (rho + x / root),
+                                            b * sigma / root])
+
+        skew = np.sqrt(1 - rho * rho)
+        jac[-1] = 0.0
+        if a + b * sigma * skew < 0:
+            jac[-1] = [-10, -10 * sigma * skew, 10 * b * sigma * rho / skew, 0, -10 * b * skew]
+        return jac
+
+    span = max(k.max() - k.min(), 0.1)
+    lower = [-1.0, 0.0, -0.999, k.min() - span, 1e-4]
+    upper = [w.max(), 10.0, 0.999, k.max() + span, 2 * span]
+
+    ## Refine the best few quasi-explicit starts
+    from scipy.optimize import least_squares
+    best = None
+    for start in _grid_starts(k, w, weights, lower, upper):
+        fit = least_squares(residuals, start, jac=jacobian, bounds=(lower, upper), method='trf')
+        if best is None or fit.cost < best.cost:
+            best = fit
+    return best.x
+
+
+## Starting points from a grid over (m, sigma): with those fixed, SVI is linear in (a, b rho, b), so every grid
+## point is one weighted linear least-squares solve, done for the whole grid at once
+def _grid_starts(k, w, weights, lower, upper, size=16, keep=3):
+
+    m, sigma = np.meshgrid(np.linspace(k.min(), k.max(), size), np.geomspace(1e-3, upper[4], size))
+    m, sigma = m.ravel()[:, None], sigma.ravel()[:, None]
+    x = k - m
+    design = np.stack([np.ones_like(x), x, np.sqrt(x * x + sigma * sigma)], axis=-1)
+
+    ## Weights turn total-variance errors into the root total variance errors the fit minimises
+    omega = (weights / (2 * np.sqrt(w)))**2
+    lhs = np.einsum('gni,n,gnj->gij', design, omega, design) + 1e-12 * np.eye(3)
+    rhs = np.einsum('gni,n,n->gi', design, omega, w)
+    a, c, b = np.moveaxis(np.linalg.solve(lhs, rhs[..., None])[..., 0], -1, 0)
+
+    b = np.clip(b, 1e-4, upper[1])
+    rho = np.clip(c / b, lower[2], upper[2])
+    params = np.clip(np.column_stack([a, b, rho, m[:, 0], sigma[:, 0]]), lower, upper)
+    model = np.sqrt(np.maximum(svi_total_variance(params[:, None, :], k), 0.0))
+    cost = np.sum((weights * (model - np.sqrt(w)))**2, axis=1)
+    return params[np.argsort(cost)[:keep]]
+
+
+## Fit one (k, w, weights) task; top level so it can run in a worker process
+def _fit_task(task):
+
+    return fit_svi(*task)
+
+
+## Forward from put-call parity on the strikes quoted on both sides near the money; the spot when too few
+def implied_forward(call_strikes, call_mids, put_strikes, put_mids, spot, band=0.1):
+
+    common, ci, pi = np.intersect1d(call_strikes, put_strikes, return_indices=True)
+    near = np.abs(common / spot - 1) <= band
+    if near.sum() < 2:
+        return float(spot)
+
+    ## C - P = DF (F - K) is linear in K with slope -DF and intercept DF F
+    slope, intercept = np.polyfit(common[near], call_mids[ci][near] - put_mids[pi][near], 1)
+    if slope >= 0:
+        return float(spot)
+    return float(-intercept / slope)
+
+
+## Log-moneyness, total variance and vega weights of the out-of-the-money quotes of one expiry
+def slice_data(chain, trade_date, expiry, spot):
+
+    call_strikes, call_rows = chain.slice(trade_date, 0, expiry)
+    put_strikes, put_rows = chain.slice(trade_date, 1, expiry)
+    days = (expiry - trade_date).days
+    forward = implied_forward(call_strikes, chain.mid[call_rows], put_strikes, chain.mid[put_rows], spot)
+
+    rows = np.r_[call_rows[call_strikes >= forward], put_rows[put_strikes < forward]]
+    rows = rows[(chain.iv[rows] > 0) & np.isfinite(chain.iv[rows])]
+    strikes = chain.strike[rows]
+    t = days / DAYS_IN_YEAR
+
+    ## Square-root vega weights favour the money without leaving the wings unfitted
+    vega = np.nan_to_num(chain.vega[rows], nan=0.0)
+    weights = np.sqrt(np.maximum(vega / vega.max(), 1e-3)) if len(vega) and vega.max() > 0 else np.ones(len(rows))
+    return days, forward, np.log(strikes / forward), chain.iv[rows]**2 * t, weights
+
+
+## SVI fits persisted by a hash of their inputs, so a surface is only refitted when its quotes change
+class SviCache:
+
+    def __init__(self, cache_dir=None):
+
+        self.cache_dir = cache_dir
+        self._params = {}
+        self._lock = threading.Lock()
+        self.fits = 0
+
+    @staticmethod
+    def key(k, w, weights):
+
+        digest = hashlib.sha1()
+        for values in (k, w, weights):
+            digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+        return digest.hexdigest()[:24]
+
+    def _path(self, key):
+
+        return os.path.join(self.cache_dir, 'svi-%s.npy' % key)
+
+    def _load(self, key):
+
+        if self.cache_dir is None or not os.path.exists(self._path(key)):
+            return None
+        return np.load(self._path(key))
+
+    def _save(self, key, params):
+
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._path(key) + '.tmp.npy'
+        np.save(tmp_path, params)
+        os.replace(tmp_path, self._path(key))
+
+    ## SVI parameters of every (k, w, weights) task; misses are fitted across a process pool when workers
+    ## is not 1 and there is more than one of them
+    def fit_many(self, tasks, workers=None):
+
+        keys = [SviCache.key(*task) for task in tasks]
+        params = [None] * len(tasks)
+        with self._lock:
+            for i, key in enumerate(keys):
+                params[i] = self._params.get(key)
+                if params[i] is None:
+                    params[i] = self._load(key)
+
+        missing = [i for i, p in enumerate(params) if p is None]
+        if workers == 1 or len(missing) <= 1:
+            fitted = [_fit_task(tasks[i]) for i in missing]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                fitted = list(pool.map(_fit_task, [tasks[i] for i in missing]))
+
+        with self._lock:
+            for i, p in zip(missing, fitted):
+                self._save(keys[i], p)
+                params[i] = p
+            self.fits += len(missing)
+            for key, p in zip(keys, params):
+                self._params[key] = p
+        return params
+
+
+class VolSurface:
+
+    def __init__(self, spot, days, forwards, params):
+
+        order = np.argsort(np.asarray(days, dtype=float))
+        self.spot = float(spot)
+        self.days = np.asarray(days, dtype=float)[order]
+        self.forwards = np.asarray(forwards, dtype=float)[order]
+        self.params = np.asarray(params, dtype=float).reshape(-1, len(SVI_FIELDS))[order]
+        for values in (self.days, self.forwards, self.params):
+            values.flags.writeable = False
+
+    ## Fit the surface of a trade date from every expiry quoted in the chain
+    @staticmethod
+    def from_chain(chain, trade_date, spot, cache=None, workers=None):
+
+        return VolSurface.from_slices(spot, [slice_data(chain, trade_date, expiry, spot)
+                                             for expiry in chain.expiries(trade_date)], cache, workers)
+
+    ## Fit a surface from (days, forward, k, w, weights) slices
+    @staticmethod
+    def from_slices(spot, slices, cache=None, workers=None):
+
+        slices = [s for s in slices if len(s[2]) >= len(SVI_FIELDS)]
+        if not slices:
+            raise ValueError("no expiry has enough quotes to fit a smile")
+        cache = SviCache() if cache is None else cache
+        params = cache.fit_many([s[2:] for s in slices], workers)
+        return VolSurface(spot, [s[0] for s in slices], [s[1] for s in slices], params)
+
+    ## Forward at any maturity, interpolating log forwards linearly in time from the spot
+    def forward(self, days):
+
+        days = np.asarray(days, dtype=float)
+        log_fwd = np.interp(days, np.r_[0.0, self.days], np.log(np.r_[self.spot, self.forwards]))
+        ## Beyond the last expiry the last forward's carry rate is kept
+        carry = np.log(self.forwards[-1] / self.spot) / self.days[-1]
+        return np.exp(np.where(days > self.days[-1], np.log(self.spot) + carry * days, log_fwd))
+
+    ## Total implied variance at arbitrary strike and maturity arrays, which broadcast against each other;
+    ## linear in time between expiries at fixed log-moneyness and proportional to time outside them
+    def total_variance(self, strike, days):
+
+        strike, days = np.broadcast_arrays(np.asarray(strike, dtype=float), np.asarray(days, dtype=float))
+        days = np.maximum(days, 1e-6)
+        k = np.log(strike / self.forward(days))
+
+        n = len(self.days)
+        i = np.searchsorted(self.days, days)
+        upper = np.minimum(i, n - 1)
+        lower = np.where(i >= n, n - 1, np.maximum(i - 1, 0))
+        w_lower = svi_total_variance(self.params[lower], k)
+        w_upper = svi_total_variance(self.params[upper], k)
+
+        between = lower != upper
+        span = np.where(between, self.days[upper] - self.days[lower], 1.0)
+        weight = np.where(between, (days - self.days[lower]) / span, 0.0)
+        w = np.where(between, w_lower + weight * (w_upper - w_lower),
+                     w_upper * days / self.days[upper])
+        return np.maximum(w, 0.0)
+
+    ## Implied vol at arbitrary strike and maturity arrays
+    def vol(self, strike, days):
+
+        days = np.maximum(np.asarray(days, dtype=float), 1e-6)
+        return np.sqrt(self.total_variance(strike, days) * DAYS_IN_YEAR / days)
@@ -0,0 +1,61 @@
+## A zero curve built once per curve date, evaluated for whole arrays of maturities
+
+import numpy as np
+
+DAYS_IN_YEAR = 365
+
+
+class YieldCurve:
+
+    def __init__(self, days, rates, interpolation='linear'):
+
+        order = np.argsort(np.asarray(days, dtype=float))
+        self.days = np.asarray(days, dtype=float)[order]
+        self.rates = np.asarray(rates, dtype=float)[order]
+        self.interpolation = interpolation
+        self.days.flags.writeable = False
+        self.rates.flags.writeable = False
+        ## Log discount factors at the knots, for log-linear interpolation
+        self._log_df = -self.rates * self.days / DAYS_IN_YEAR
+
+    ## Curve from the zero curve file rows of one date; rates there are in %
+    @staticmethod
+    def from_frame(df_data, interpolation='linear'):
+
+        return YieldCurve(df_data['Days'].to_numpy(), df_data['Rate'].to_numpy()/100, interpolation)
+
+    ## A generated flat curve
+    @staticmethod
+    def flat(rate):
+
+        return YieldCurve([1, 365], [rate, rate])
+
+    ## A generated Nelson-Siegel curve sampled on the given maturities in days
+    @staticmethod
+    def nelson_siegel(beta0, beta1, beta2, tau, days=(1, 7, 30, 91, 182, 365, 730, 1825, 3650),
+                      interpolation='linear'):
+
+        t = np.asarray(days, dtype=float) / DAYS_IN_YEAR
+        x = t / tau
+        loading = (1 - np.exp(-x)) / x
+        return YieldCurve(days, beta0 + beta1 * loading + beta2 * (loading - np.exp(-x)), interpolation)
+
+    ## Continuously compounded zero rates for maturities in days, flat beyond the knots
+    def rate(self, days):
+
+        days = np.asarray(days, dtype=float)
+        if self.interpolation == 'log_linear':
+            clipped = np.clip(days, self.days[0], self.days[-1])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rates = -np.interp(clipped, self.days, self._log_df) * DAYS_IN_YEAR / clipped
+            rates = np.where(clipped > 0, rates, self.rates[0])
+        else:
+            rates = np.interp(days, self.days, self.rates)
+        return rates[()] if rates.ndim == 0 else rates
+
+    ## Discount factors for maturities in days
+    def discount_factor(self, days):
+
+        days = np.asarray(days, dtype=float)
+        factors = np.exp(-np.asarray(self.rate(days)) * days / DAYS_IN_YEAR)
+        return factors[()] if factors.ndim == 0 else factors
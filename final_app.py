@@ -4,7 +4,75 @@ import Utilities as ut
 import pandas as pd
 import Garch as ga
 import OptionStrategy as OS
- 
+import MultiDate as md
+from Utilities import instrumentation as inst
+
+                                        ########################### Cached computations #######################
+
+## Trade dates with every input the app needs
+@st.cache_data(show_spinner=False)
+def load_trade_dates():
+
+    return md.available_dates()
+
+## Market inputs of an option; loaded once per (days to expiry, strike, option type, trade date) and shared across sessions
+@st.cache_data(show_spinner=False)
+def load_option_inputs(days_to_expiry, strike_price, option_type, trade_date):
+
+    bsm = bs.BSM(days_to_expiry, strike_price, option_type, trade_date)
+    bsm.calc_interest_rates()
+    bsm.calc_dividend()
+    bsm.calc_spotprice_SPX()
+    bsm.calc_implied_vol()
+    return bsm.interest_rates, bsm.dividend, bsm.spot_price, bsm.iv, bsm.mid_bid_ask
+
+## BSM price keyed on its full input tuple
+@st.cache_data(show_spinner=False)
+def price_option(spot, strike, days_to_expiry, rate, dividend, vol, option_type):
+
+    return bs.price_batch(spot, strike, days_to_expiry, rate, dividend, vol, option_type)
+
+## Implied vol of the mean bid-ask price keyed on its full input tuple
+@st.cache_data(show_spinner=False)
+def solve_implied_vol(mid, spot, strike, days_to_expiry, rate, dividend, option_type):
+
+    return bs.implied_vol_batch(mid, spot, strike, days_to_expiry, rate, dividend, option_type,
+                                lower=0.01, upper=3, clamp=True).iv
+
+## The fitted Garch(1,1) model and its results, shared by every session as a read-only resource
+@st.cache_resource(show_spinner=False)
+def load_garch(trade_date):
+
+    garch = ga.Garch(trade_date)
+    garch.calc_ann_option_vol()
+    garch.calc_ann_realised_vol()
+    garch.calc_vix_vol()
+    return garch
+
+## Iron condor payoff and P&L table for a spot and forecast vol
+@st.cache_data(show_spinner=False)
+def build_iron_condor(spot, forecast_vol, trade_date):
+
+    return OS.OptionStrategyBuilder(spot, forecast_vol, trade_date).build_ironcondor()
+
+## A BSM object filled from the cached market inputs
+def new_bsm(days_to_expiry, strike_price, option_type, trade_date):
+
+    bsm = bs.BSM(days_to_expiry, strike_price, option_type, trade_date)
+    (bsm.interest_rates, bsm.dividend, bsm.spot_price,
+     bsm.iv, bsm.mid_bid_ask) = load_option_inputs(days_to_expiry, strike_price, option_type, trade_date)
+    return bsm
+
+## Delta-hedged portfolio table and summary keyed on the option and hedge inputs
+@st.cache_data(show_spinner=False)
+def hedged_portfolio(days_to_expiry, strike_price, option_type, trade_date, check_iv, brent_iv, vol_type, trans_costs):
+
+    bsm = new_bsm(days_to_expiry, strike_price, option_type, trade_date)
+    bsm.check_iv = check_iv
+    bsm.brent_iv = brent_iv
+    df_delta = bsm.calc_hedged_portfolio(vol_type, trans_costs)
+    return df_delta, bsm.option_premium, bsm.option_payoff, bsm.sum_transaction_costs, bsm.total_pnl
+
                                         ########################### Page config #######################
 st.set_page_config(
         page_title="Option Pricing Model",
@@ -20,7 +88,20 @@ st.set_page_config(
 #sidebar title
 
 st.sidebar.write("Here is your control panel ")
-st.sidebar.info('Trade date : 12/08/2015', icon="ℹ️")
+
+## Checkbox to time every stage of this rerun; timing is scoped to this session's script thread through its
+## collector, so one session's checkbox never turns it on for the others
+perf_panel = st.sidebar.checkbox("Show performance panel ⏱️")
+run_stats = inst.Registry()
+inst.set_collector(run_stats if perf_panel else None)
+
+## Select box to choose the trade date, starting on the default date or, if the data lacks it, the latest one
+trade_dates = load_trade_dates()
+default_date = (trade_dates.get_loc(ut.Utilities.TRADE_DATE) if ut.Utilities.TRADE_DATE in trade_dates
+                else max(len(trade_dates) - 1, 0))
+trade_date = st.sidebar.selectbox(
+    "Trade date", trade_dates, index=default_date,
+    format_func=lambda date: date.strftime('%d/%m/%Y'))
 
                                         ################### Sidebar parameters #####################
 
@@ -38,12 +119,11 @@ else:
 strike_price = st.sidebar.number_input(
     "Enter a strike price for your option (750-2500)", min_value=750, max_value=2500, value=2090, step=10)
 
-if strike_price not in ut.Utilities.get_strike_prices(option_type):
-    st.sidebar.error("Strike price not in given data!!! Please re-enter!!!")
-    st.stop()
+if not ut.Utilities.option_chain().has_strike(trade_date, strike_price, option_type):
+    st.sidebar.info("Strike price not quoted on this date, its IV is read from the fitted volatility surface", icon="ℹ️")
 
 ## Checkbox to Calculate Iv using Brent's algorithm
-bs.BSM.check_iv = st.sidebar.checkbox("Brent's Volatility Solver")
+check_iv = st.sidebar.checkbox("Brent's Volatility Solver")
 
 
                                             ##################### Sidebar plots #######################
@@ -88,7 +168,14 @@ if delta_hedge:
     hedge_plots = st.sidebar.radio(
             "Choose Plot", ("Delta", "Cumulative P&L ($)"), horizontal=True)
 
-bsm = bs.BSM(days_to_expiry, strike_price, option_type)
+## The session keeps its own BSM object, rebuilt only when the option changes
+bsm_key = (days_to_expiry, strike_price, option_type, trade_date)
+if st.session_state.get("bsm_key") != bsm_key:
+    st.session_state["bsm"] = new_bsm(days_to_expiry, strike_price, option_type, trade_date)
+    st.session_state["bsm_key"] = bsm_key
+
+bsm = st.session_state["bsm"]
+bsm.check_iv = check_iv
 
                                             ################### Main_section ######################
 
@@ -100,32 +187,30 @@ st.subheader("Derivative Securities Project - Group 15")
 col1, col2, col3, col4, col5 = st.columns(5)
 
 with col1:
-    bsm.calc_interest_rates()
     st.metric("Interest rate (%)", round(bsm.interest_rates * 100, 3))
 
 with col2:
-    bsm.calc_dividend()
     st.metric("Dividend Yield (%)", round(bsm.dividend * 100, 3))
 
 with col3:
-    bsm.calc_spotprice_SPX()
     st.metric("SPX Spot Price ($)", round(bsm.spot_price, 2))
 
 with col4:
-    bsm.calc_implied_vol()
     st.metric("Given Option IV", round(bsm.iv, 3))
 
 with col5:
-    bsm.calc_option_value()
-    st.metric("BSM Option Price($)", round(bs.BSM.bsm_option_price, 3))
+    bsm.bsm_option_price = price_option(bsm.spot_price, bsm.strike_price, bsm.days_to_expiry, bsm.interest_rates,
+                                        bsm.dividend, bsm.iv, bsm.call_or_put)
+    st.metric("BSM Option Price($)", round(bsm.bsm_option_price, 3))
 
 with col4:
-    if bs.BSM.check_iv:
-        bsm.imp_vol_solver()
+    if bsm.check_iv:
+        bsm.brent_iv = solve_implied_vol(bsm.mid_bid_ask, bsm.spot_price, bsm.strike_price, bsm.days_to_expiry,
+                                         bsm.interest_rates, bsm.dividend, bsm.call_or_put)
         st.metric("Calculated Option IV", round(bsm.brent_iv, 3))
 
 with col5:
-    if bs.BSM.check_iv:
+    if bsm.check_iv:
         st.metric("Mean Bid-Ask Price($)", round(bsm.mid_bid_ask, 3))
 
 st.write("-------------------------------")
@@ -161,10 +246,10 @@ if charts:
 ## Garch Implementation
 if table:
 
-    garch = ga.Garch()
-    garch_result = [['Annualised Option Period Forecasted Volatility', round(garch.calc_ann_option_vol(),4)],
-                    ['Annualised Option Period Realised Volatility', round(garch.calc_ann_realised_vol(),4)],
-                    ['VIX Volatility For Trade Date', round(garch.calc_vix_vol(),4)],
+    garch = load_garch(trade_date)
+    garch_result = [['Annualised Option Period Forecasted Volatility', round(garch.ann_option_vol,4)],
+                    ['Annualised Option Period Realised Volatility', round(garch.ann_realised_vol,4)],
+                    ['VIX Volatility For Trade Date', round(garch.vix,4)],
                     ['Implied Volatility For Trade Date', round(bsm.iv*100,4)]]
 
     df_garch_result = pd.DataFrame(garch_result,columns=['Metric','Value'])
@@ -175,16 +260,19 @@ if table:
     garch.plot_garch_vol()
 
     ###### Plot the option strategy ########
-    osb = OS.OptionStrategyBuilder(bsm.spot_price, garch.ann_option_vol)
+    pd_os, out = build_iron_condor(bsm.spot_price, garch.ann_option_vol, trade_date)
     st.success("🚀 Plotted Iron Condor option strategy")
-    out = osb.ironcondor()
+    ut.Utilities.plot_chart(pd_os)
     st.success("🌳 Iron Condor P&L")
     st.dataframe(out,use_container_width=True)
     st.metric("Profit and Loss from Iron Condor strategy ($): ", round(out.loc['Value on expiry($)','Total'],3), delta = '-Loss')
 
 
 if delta_hedge:
-    df_delta = bsm.calc_hedged_portfolio(vol_type, trans_costs)
+    (df_delta, bsm.option_premium, bsm.option_payoff,
+     bsm.sum_transaction_costs, bsm.total_pnl) = hedged_portfolio(days_to_expiry, strike_price, option_type,
+                                                                   trade_date, bsm.check_iv, bsm.brent_iv, vol_type,
+                                                                   trans_costs)
 
     st.success("🌳 Delta-Hedged Portfolio")
     st.dataframe(df_delta, use_container_width=True)
@@ -212,3 +300,22 @@ if delta_hedge:
     else:
         st.success("🚀 Plotted Cumulative P&L on Trade against the Days to Expiry")
         ut.Utilities.plot_chart(df_delta[['DTE', "Cum. P&L ($)"]])
+
+## Performance panel: every timed stage of this rerun, slowest first
+if perf_panel:
+    st.write("-------------------------------")
+    st.success("⏱️ Time spent per stage in this rerun")
+    stats = run_stats.snapshot()
+    if stats:
+        df_perf = pd.DataFrame.from_dict(stats, orient='index').sort_values('wall_seconds', ascending=False)
+        st.dataframe(df_perf, use_container_width=True)
+    else:
+        st.info("Every stage was served from the cache in this rerun", icon="ℹ️")
+
+    perf_col1, perf_col2 = st.columns(2)
+    with perf_col1:
+        st.download_button("Export this rerun as JSON", run_stats.to_json(indent=2), "performance.json",
+                           "application/json")
+    with perf_col2:
+        st.download_button("Export process counters as Prometheus text", inst.REGISTRY.to_prometheus(),
+                           "metrics.prom", "text/plain")